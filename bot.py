@@ -6,16 +6,17 @@ Telegram Vyakarana Bot
 
 import os
 import time
+import signal
+import asyncio
 import logging
+import inspect
 import datetime
+import importlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 from telethon import TelegramClient, events, sync, Button  # noqa
-from indic_transliteration import sanscript
-
-import tabulate
-
-from heritage import HeritagePlatform, HERITAGE_LANG
-import sanskrit_text as skt
+from telethon.errors import MessageNotModifiedError
 
 # local
 import config
@@ -24,6 +25,9 @@ from constants import (
     MESSAGE_INTRODUCTION,
     MESSAGE_AVAILABLE_COMMANDS,
     MESSAGE_NO_SEGMENTER,
+    MESSAGE_LOADING,
+    MESSAGE_BUSY,
+    MESSAGE_RATE_LIMITED,
     MESSAGE_CHOOSE_SCHEME,
     MESSAGE_THANK_YOU,
     MESSAGE_ASK_QUERY,
@@ -34,10 +38,18 @@ from constants import (
     MESSAGE_UNKNOWN_VERB,
     MESSAGE_CHOOSE_TYPE,
     MESSAGE_SUGGESTION_REPLY,
+    MESSAGE_PAGE_EXPIRED,
+    MESSAGE_RELOADING,
+    MESSAGE_RELOADED,
+    MESSAGE_RELOAD_UNCHANGED,
+    MESSAGE_RELOAD_FAILED,
+    MESSAGE_DEADLINE_EXCEEDED,
+    MESSAGE_PARTIAL,
 
     CALLBACK_SEPARATOR,
     CALLBACK_PREFIX_SCHEME,
     CALLBACK_PREFIX_QUERY,
+    CALLBACK_PREFIX_PAGE,
 
     KEYWORD_FULL,
 
@@ -56,9 +68,25 @@ from constants import (
     COMMAND_DETAILS,
     BUTTONS,
 )
-from utils.functions import fold
+from utils.functions import fold, is_devanagari
 from utils.dhatupatha import DhatuPatha, DHATU_LANG, LAKARA_LANG, VALUES_LANG
-from utils.shabdapatha import ShabdaPatha
+from utils.shabdapatha import ShabdaPatha, VALUES_LANG as SHABDA_VALUES_LANG
+from utils.cache import Cache, MemoryBudget, NegativeCache
+from utils.prefetch import Prefetcher
+from utils.workers import WorkerPool, WorkerError
+from utils.components import Components, ComponentError
+from utils.router import CommandTrie
+from utils.transliteration import TRANSLITERATOR, transliterate
+from utils.preferences import PreferenceStore
+from utils.logwriter import LogWriter
+from utils.singleflight import SingleFlight
+from utils.scheduler import Scheduler, Lane, Overloaded, RateLimited
+from utils.outbox import Outbox
+from utils.lexicon import Lexicon, build_form_index, prefork
+from utils.deadline import (
+    DeadlineExceeded, request_context, check, within
+)
+from utils.pagination import Pagination, PageStore
 
 ###############################################################################
 
@@ -75,43 +103,179 @@ LOGGER.setLevel(logging.INFO)
 
 ###############################################################################
 # Initialization
+#
+# Data and platforms are loaded in background threads, started from main(),
+# so that the bot connects immediately. Handlers wait for the components
+# they need, using COMPONENTS.wait().
+
+DHATUPATHA = None
+SHABDAPATHA = None
+FORM_INDEX = None
+LEXICON = None
+LEXICON_POOL = None
+Heritage = None
+# Options of the Heritage Platform calls, set by load_heritage()
+HERITAGE_OPTIONS = {}
 
 # --------------------------------------------------------------------------- #
 
-DHATUPATHA = DhatuPatha(
-    config.DHATU_FILE,
-    display_keys=[
-        'baseindex', 'dhatu', 'aupadeshik', 'gana', 'pada', 'artha', 'karma',
-        'artha_english'
-    ]
-)
 
-# --------------------------------------------------------------------------- #
+def read_dhatupatha():
+    return DhatuPatha(
+        config.DHATU_FILE,
+        display_keys=[
+            'baseindex', 'dhatu', 'aupadeshik', 'gana', 'pada', 'artha',
+            'karma', 'artha_english'
+        ]
+    )
+
+
+def read_shabdapatha():
+    return ShabdaPatha(config.SHABDA_FILE)
+
+
+def make_form_index(dhatupatha, shabdapatha):
+    return build_form_index(
+        dhatupatha, shabdapatha, COMMAND_VERB, COMMAND_WORD
+    )
 
-SHABDAPATHA = ShabdaPatha(config.SHABDA_FILE)
 
 # --------------------------------------------------------------------------- #
 
-if not config.HELLWIG_SPLITTER_DIR:
-    class NonSplitter:
-        def split(self, sentence):
-            return MESSAGE_NO_SEGMENTER
-    VISHLESHANA = NonSplitter()
-else:
-    from utils.splitter import Splitter
-    VISHLESHANA = Splitter(config.HELLWIG_SPLITTER_DIR)
+
+def load_dhatupatha():
+    global DHATUPATHA
+    DHATUPATHA = read_dhatupatha()
+    return DHATUPATHA
+
+
+def load_shabdapatha():
+    global SHABDAPATHA
+    SHABDAPATHA = read_shabdapatha()
+    return SHABDAPATHA
+
+
+def load_form_index():
+    global FORM_INDEX
+    FORM_INDEX = make_form_index(DHATUPATHA, SHABDAPATHA)
+    return FORM_INDEX
+
+
+def load_lexicon():
+    """Lookups on the data, in forked workers if LEXICON_WORKERS is set"""
+    global LEXICON, LEXICON_POOL
+    LEXICON = Lexicon(DHATUPATHA, SHABDAPATHA)
+    if config.LEXICON_WORKERS:
+        LEXICON_POOL = prefork(
+            LEXICON, config.LEXICON_WORKERS, timeout=config.LEXICON_TIMEOUT
+        )
+    return LEXICON
+
+
+def lexicon_pool():
+    """
+    LEXICON_POOL, None if none of its workers is left
+
+    Lexicon workers that die are not restarted (they are forked), the
+    lookups are then served in this process.
+    """
+    if LEXICON_POOL is not None and LEXICON_POOL.available:
+        return LEXICON_POOL
+    return None
+
+
+def lookup(method, *args):
+    """Blocking call of a Lexicon method, in a worker if there are any"""
+    pool = lexicon_pool()
+    if pool is not None:
+        try:
+            return pool.submit(method, *args).result(config.LEXICON_TIMEOUT)
+        except WorkerError as e:
+            LOGGER.warning(f"Lexicon worker failed ({e}), looking up here.")
+    return getattr(LEXICON, method)(*args)
+
+
+async def async_lookup(method, *args):
+    pool = lexicon_pool()
+    if pool is not None:
+        try:
+            return await pool.run(method, *args)
+        except WorkerError as e:
+            LOGGER.warning(f"Lexicon worker failed ({e}), looking up here.")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        LOOKUP_EXECUTOR, getattr(LEXICON, method), *args
+    )
+
+
+async def heritage_call(method, *args):
+    """Call of a method of the Heritage Platform, in HERITAGE_EXECUTOR"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        HERITAGE_EXECUTOR,
+        functools.partial(getattr(Heritage, method), **HERITAGE_OPTIONS),
+        *args
+    )
+
+
+def load_heritage():
+    global Heritage, HERITAGE_OPTIONS
+    from heritage import HeritagePlatform
+
+    # dictionaries and lists are expected, newer versions of heritage
+    # return dataclasses unless asked otherwise
+    parameters = inspect.signature(HeritagePlatform.get_analysis).parameters
+    if 'structured' in parameters:
+        HERITAGE_OPTIONS = {'structured': False}
+
+    if config.HERITAGE_PLATFORM_DIR:
+        Heritage = HeritagePlatform(config.HERITAGE_PLATFORM_DIR)
+    else:
+        Heritage = HeritagePlatform(
+            '', method='web', base_url=config.HERITAGE_BASE_URL or None
+        )
+    return Heritage
+
+
+COMPONENTS = Components()
+COMPONENTS.add('dhatupatha', load_dhatupatha)
+COMPONENTS.add('shabdapatha', load_shabdapatha)
+COMPONENTS.add(
+    'form_index', load_form_index, depends=['dhatupatha', 'shabdapatha']
+)
+# lexicon workers are forked from main(), before any thread is started
+COMPONENTS.add('lexicon', load_lexicon, depends=['dhatupatha', 'shabdapatha'])
+COMPONENTS.add('heritage', load_heritage)
+# imported on first use, imported here ahead of the first request
+COMPONENTS.add(
+    'tabulate', functools.partial(importlib.import_module, 'tabulate')
+)
 
 # --------------------------------------------------------------------------- #
 
-if config.HERITAGE_PLATFORM_DIR:
-    Heritage = HeritagePlatform(config.HERITAGE_PLATFORM_DIR)
+if not config.HELLWIG_SPLITTER_DIR:
+    VISHLESHANA = None
 else:
-    Heritage = HeritagePlatform('', method='web')
+    # Splitter is hosted in worker processes, started from main()
+    VISHLESHANA = WorkerPool(
+        'utils.splitter.Splitter',
+        (config.HELLWIG_SPLITTER_DIR,),
+        {
+            'cache_file': config.SPLITTER_CACHE_FILE or None,
+            'intra_op_threads': config.SPLITTER_INTRA_OP_THREADS,
+            'inter_op_threads': config.SPLITTER_INTER_OP_THREADS,
+            'optimize': config.SPLITTER_OPTIMIZE,
+        },
+        replicas=config.SPLITTER_WORKERS,
+        timeout=config.SPLITTER_TIMEOUT
+    )
 
 # --------------------------------------------------------------------------- #
+# Suggestions are appended to a single log, by a background writer
 
-if not os.path.isdir(config.SUGGESTION_DIR):
-    os.makedirs(config.SUGGESTION_DIR)
+SUGGESTIONS = LogWriter(
+    os.path.join(config.SUGGESTION_DIR, 'suggestions.jsonl')
+)
 
 ###############################################################################
 # Bot Client
@@ -122,24 +286,66 @@ bot = TelegramClient(
     config.TelegramConfig.api_hash
 )
 
+# --------------------------------------------------------------------------- #
+# Replies are queued, and sent in the background within the rate limits
+# of Telegram. respond() and reply() return a future of the sent Message.
+
+OUTBOX = Outbox(bot)
+
+
+def respond(event, message, **kwargs):
+    return OUTBOX.send(
+        event.chat_id, message, entity=event.input_chat, **kwargs
+    )
+
+
+def reply(event, message, **kwargs):
+    if isinstance(event, events.CallbackQuery.Event):
+        reply_to = event.message_id
+    else:
+        reply_to = event.id
+    return respond(event, message, reply_to=reply_to, **kwargs)
+
+
 ###############################################################################
 # Transliteration Configuration
 
+# Scheme names of indic_transliteration.sanscript
 TRANSLITERATION_SCHEMES = {
-    sanscript.DEVANAGARI: 'देवनागरी',
-    sanscript.HK: 'Harvard-Kyoto',
-    sanscript.VELTHUIS: 'Velthuis',
-    sanscript.ITRANS: 'ITRANS',
-    sanscript.SLP1: 'SLP1',
-    sanscript.WX: 'WX'
+    'devanagari': 'देवनागरी',
+    'hk': 'Harvard-Kyoto',
+    'velthuis': 'Velthuis',
+    'itrans': 'ITRANS',
+    'slp1': 'SLP1',
+    'wx': 'WX'
 }
-TRANSLITERATION_SCHEME_COMMAND = sanscript.HK
-TRANSLITERATION_SCHEME_DEFAULT = sanscript.DEVANAGARI
-TRANSLITERATION_SCHEME_INTERNAL = sanscript.DEVANAGARI
+TRANSLITERATION_SCHEME_COMMAND = 'hk'
+TRANSLITERATION_SCHEME_DEFAULT = 'devanagari'
+TRANSLITERATION_SCHEME_INTERNAL = 'devanagari'
+TRANSLITERATION_SCHEME_SPLITTER = 'iast'
+
+
+def load_transliteration():
+    """Precompile the scheme maps used by the handlers"""
+    pairs = [
+        (TRANSLITERATION_SCHEME_INTERNAL, TRANSLITERATION_SCHEME_COMMAND),
+        (TRANSLITERATION_SCHEME_COMMAND, TRANSLITERATION_SCHEME_INTERNAL),
+        (TRANSLITERATION_SCHEME_INTERNAL, TRANSLITERATION_SCHEME_SPLITTER),
+    ]
+    for scheme in TRANSLITERATION_SCHEMES:
+        pairs.append((scheme, TRANSLITERATION_SCHEME_INTERNAL))
+        pairs.append((TRANSLITERATION_SCHEME_INTERNAL, scheme))
+    return TRANSLITERATOR.precompile(pairs)
+
+
+COMPONENTS.add('transliteration', load_transliteration)
 
 ###############################################################################
+# User Preferences (opened from main())
 
-transliteration_scheme = {}
+PREFERENCES = PreferenceStore(
+    config.PREFERENCES_FILE, sync_interval=config.PREFERENCES_SYNC_INTERVAL
+)
 
 ###############################################################################
 
@@ -154,20 +360,332 @@ GENDER_MAP = {
     'त्रिलिङ्गम्': 'a'
 }
 
+PREFETCH_CANDIDATES = 3
+PREFETCH_CONCURRENCY = 4
+PREFETCH_CACHE_SIZE = 1024
+
+# Threads for the (blocking) calls of the Heritage Platform and prefetches
+# of declensions, and for the local lookups
+HERITAGE_THREADS = 12
+LOOKUP_THREADS = 4
+
+MAX_MESSAGE_LENGTH = 4096
+
+# Limit of the splitter on IAST text is 128 characters
+SPLITTER_MAX_LENGTH = 127
+SEGMENTATION_CONCURRENCY = 4
+SEGMENTATION_EDIT_INTERVAL = 1.0
+
+NEGATIVE_CACHE_SIZE = 4096
+NEGATIVE_CACHE_TTL = 6 * 60 * 60
+
+RESPONSE_CACHE_BYTES = 16 * 1024 * 1024
+
+# Lakaras shown without the 'full' keyword
+SHOW_LAKARA = [
+    'plat', 'plang', 'plrut', 'plot',
+    'alat', 'alang', 'alrut', 'alot'
+]
+
+# Results are shown a page at a time, with buttons for the other pages
+VERB_MATCHES_PER_PAGE = 5
+PAGE_LABELS_PER_ROW = 4
+PAGE_DOCUMENT = 'doc'
+
+# Request lanes, local lookups (fast) and Heritage Platform or splitter (slow)
+LANE_FAST = 'fast'
+LANE_SLOW = 'slow'
+FAST_LANE_CONCURRENCY = 64
+FAST_LANE_QUEUE_SIZE = 512
+FAST_LANE_USER_RATE = 2.0
+FAST_LANE_USER_BURST = 10
+SLOW_LANE_CONCURRENCY = 8
+SLOW_LANE_QUEUE_SIZE = 32
+SLOW_LANE_USER_RATE = 0.2
+SLOW_LANE_USER_BURST = 3
+# Time (in seconds) a request may take, from its dispatch to the reply
+FAST_LANE_DEADLINE = 10
+SLOW_LANE_DEADLINE = 30
+
 ###############################################################################
 
 
 def get_user_scheme(sender_id):
-    global transliteration_scheme
-    return transliteration_scheme.get(sender_id, {
-        'input': TRANSLITERATION_SCHEME_DEFAULT
-    })['input']
+    return PREFERENCES.get(
+        sender_id, 'input', TRANSLITERATION_SCHEME_DEFAULT
+    )
+
+
+###############################################################################
+# Lookups
+
+
+def data_version():
+    """Version of the local data, part of the key of derived caches"""
+    return f'{DHATUPATHA.version}.{SHABDAPATHA.version}'
+
+
+# Calls of the Heritage Platform may take seconds, they run in an executor
+# of their own so that they cannot hold up the local lookups
+HERITAGE_EXECUTOR = ThreadPoolExecutor(
+    HERITAGE_THREADS, thread_name_prefix='Heritage'
+)
+LOOKUP_EXECUTOR = ThreadPoolExecutor(
+    LOOKUP_THREADS, thread_name_prefix='Lookup'
+)
+
+# Lookup caches are keyed by (data_version(), *arguments), the version is
+# not used by the fetch functions themselves
+
+
+def fetch_declensions(version, root, gender):
+    """Declension table from ShabdaPatha, or Heritage Platform otherwise"""
+    shabdapatha_gender = GENDER_MAP[gender].replace('a', 'm')
+    rupaani = lookup('get_declensions', root, shabdapatha_gender)
+    if rupaani is not None:
+        return rupaani
+    return Heritage.get_declensions(root, gender, **HERITAGE_OPTIONS)
+
+
+def fetch_conjugations(version, dhaatu_idx):
+    """Dhatu details and conjugation tables from DhatuPatha"""
+    return lookup('get_conjugations', dhaatu_idx)
+
 
+async def local_word_matches(search_key):
+    """Forms in ShabdaPatha, grouped by root and gender like the analyses"""
+    grouped_matches = {}
+    for match in await async_lookup('search_shabda', search_key):
+        if match['type'] != 'rupaani':
+            continue
+        shabda = match['shabda']
+        gender = SHABDA_VALUES_LANG['linga'][shabda['linga']]
+        case, number = match['desc'].split()
+        grouped_matches.setdefault(shabda['word'], {}).setdefault(
+            gender, []
+        ).append({'case': case, 'number': number})
+    return grouped_matches
+
+
+# --------------------------------------------------------------------------- #
+# Lookup and render caches share one memory budget
+
+CACHE_BUDGET = MemoryBudget(config.CACHE_MEMORY_BYTES)
+
+DECLENSIONS = Prefetcher(
+    fetch_declensions,
+    Cache('declensions', maxsize=PREFETCH_CACHE_SIZE, budget=CACHE_BUDGET),
+    concurrency=PREFETCH_CONCURRENCY,
+    executor=HERITAGE_EXECUTOR
+)
+CONJUGATIONS = Prefetcher(
+    fetch_conjugations,
+    Cache('conjugations', maxsize=PREFETCH_CACHE_SIZE, budget=CACHE_BUDGET),
+    concurrency=PREFETCH_CONCURRENCY,
+    executor=LOOKUP_EXECUTOR
+)
+
+# Confirmed misses of /dhatu and /shabda, keyed by (version, command, query)
+UNKNOWN = NegativeCache(NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL)
+
+# --------------------------------------------------------------------------- #
+# Rendered messages of deterministic commands, keyed by response_key()
+
+
+def response_key(command, *args):
+    return (command, args, data_version())
+
+
+def response_size(chunks):
+    return sum(len(chunk.encode('utf-8')) for chunk in chunks)
+
+
+# TinyLFU keeps popular responses from being evicted by one-off requests
+RESPONSES = Cache(
+    'responses',
+    maxsize=None,
+    max_bytes=RESPONSE_CACHE_BYTES,
+    policy='tinylfu',
+    budget=CACHE_BUDGET,
+    sizeof=response_size
+)
+
+
+# Concurrent identical requests share one computation
+INFLIGHT = SingleFlight()
+
+
+async def get_response(key, render, *args):
+    """Rendered response from RESPONSES, or `await render(*args)`"""
+    output = RESPONSES.get(key)
+    if output is None:
+        output = await INFLIGHT.run(key, render_response, key, render, *args)
+    return output
+
+
+async def render_response(key, render, *args):
+    output = await render(*args)
+    RESPONSES.set(key, output)
+    return output
+
+
+async def conjugation_page(dhaatu_idx, full_flag, lakara):
+    dhaatu, rupaani = await CONJUGATIONS.get((data_version(), dhaatu_idx))
+    return render_conjugation_page(
+        dhaatu_idx, dhaatu, lakara, rupaani[lakara], full_flag
+    )
+
+
+async def declension_response(root, gender):
+    rupaani = await DECLENSIONS.get((data_version(), root, gender))
+    return render_declensions(root, gender, rupaani)
+
+
+# --------------------------------------------------------------------------- #
+# Paginated results, referred to by a handle in the data of inline buttons
+
+PAGES = PageStore()
+
+
+def page_data(handle, page):
+    return CALLBACK_SEPARATOR.join([CALLBACK_PREFIX_PAGE, handle, str(page)])
+
+
+def page_buttons(handle, pagination, idx):
+    """Buttons for the pages of `pagination`, while showing page `idx`"""
+    keyboard = []
+    if pagination.labels:
+        buttons = [
+            Button.inline(
+                f'• {label}' if _idx == idx else label,
+                data=page_data(handle, _idx)
+            )
+            for _idx, label in enumerate(pagination.labels)
+        ]
+        keyboard.extend(
+            buttons[i:i + PAGE_LABELS_PER_ROW]
+            for i in range(0, len(buttons), PAGE_LABELS_PER_ROW)
+        )
+
+    navigation = []
+    if idx > 0:
+        navigation.append(Button.inline('◀', data=page_data(handle, idx - 1)))
+    if pagination.count > 1:
+        navigation.append(Button.inline(
+            f'{idx + 1}/{pagination.count}', data=page_data(handle, idx)
+        ))
+    if idx < pagination.count - 1:
+        navigation.append(Button.inline('▶', data=page_data(handle, idx + 1)))
+    if pagination.document:
+        navigation.append(Button.inline(
+            '📄', data=page_data(handle, PAGE_DOCUMENT)
+        ))
+    if navigation:
+        keyboard.append(navigation)
+    return keyboard or None
+
+
+async def send_first_page(event, pagination):
+    check('formatting')
+    handle = PAGES.add(pagination)
+    respond(
+        event,
+        await pagination.page(0),
+        buttons=page_buttons(handle, pagination, 0)
+    )
+
+
+def paginate_conjugations(dhaatu_idx, rupaani, full_flag):
+    """One page per lakara, each rendered (and cached) when requested"""
+    lakaras = conjugation_lakaras(rupaani, full_flag)
+
+    async def render(idx):
+        lakara = lakaras[idx]
+        output = await get_response(
+            response_key(COMMAND_CONJUGATION, dhaatu_idx, full_flag, lakara),
+            conjugation_page, dhaatu_idx, full_flag, lakara
+        )
+        return output[0]
+
+    async def render_document():
+        # header and link once, instead of on every page
+        dhaatu, _ = await CONJUGATIONS.get((data_version(), dhaatu_idx))
+        return render_conjugations(
+            dhaatu_idx, dhaatu, lakaras, rupaani, full_flag
+        )
+
+    return Pagination(
+        render,
+        len(lakaras),
+        labels=[lakara_label(lakara) for lakara in lakaras],
+        document=f'dhatu_{dhaatu_idx}.txt' if len(lakaras) > 1 else None,
+        render_document=render_document
+    )
+
+
+def paginate_verb_matches(search_key, matches):
+    """VERB_MATCHES_PER_PAGE matches per page"""
+    count = -(-len(matches) // VERB_MATCHES_PER_PAGE)
+
+    async def render(idx):
+        start = idx * VERB_MATCHES_PER_PAGE
+        return render_verb_matches(
+            matches[start:start + VERB_MATCHES_PER_PAGE]
+        )
+
+    return Pagination(
+        render,
+        count,
+        document=f'dhatu_{search_key}.txt' if count > 1 else None
+    )
+
+
+def prewarm_responses():
+    """Render the conjugations of frequently requested dhatus"""
+    for search_key in config.RESPONSE_PREWARM_DHATUS:
+        dhaatu_idx = DHATUPATHA.validate_index(search_key)
+        result = (
+            fetch_conjugations(data_version(), dhaatu_idx)
+            if dhaatu_idx else None
+        )
+        if result is None:
+            LOGGER.warning(f"Cannot prewarm unknown dhatu {search_key}.")
+            continue
+        dhaatu, rupaani = result
+        # only the first page is rendered before a button is pressed
+        for full_flag in [False, True]:
+            lakaras = conjugation_lakaras(rupaani, full_flag)
+            if not lakaras:
+                continue
+            RESPONSES.set(
+                response_key(
+                    COMMAND_CONJUGATION, dhaatu_idx, full_flag, lakaras[0]
+                ),
+                render_conjugation_page(
+                    dhaatu_idx, dhaatu, lakaras[0], rupaani[lakaras[0]],
+                    full_flag
+                )
+            )
+    return RESPONSES
+
+
+COMPONENTS.add(
+    'responses',
+    prewarm_responses,
+    depends=['lexicon', 'tabulate']
+)
 
 ###############################################################################
 # Output Formatters
 
 
+def iast_length(text):
+    """Length of the text in IAST, the script of the splitter"""
+    return len(transliterate(
+        text, TRANSLITERATION_SCHEME_INTERNAL, TRANSLITERATION_SCHEME_SPLITTER
+    ))
+
+
 def format_word_match(root, gender, cases):
     """ Print root, gender, list(vibhakti - vachan) """
     output = [
@@ -214,6 +732,8 @@ def format_verb_match(dhaatu):
 
 
 def format_declensions(rupaani):
+    import tabulate
+
     formatted_table = tabulate.tabulate(
         [[', '.join(cell) for cell in row] for row in rupaani],
         headers="firstrow",
@@ -224,58 +744,107 @@ def format_declensions(rupaani):
     return f"```{formatted_table}```"
 
 
-def format_conjugations(dhatu, rupaani, full_flag):
-    output = [
+def format_dhatu_header(dhatu):
+    return '\n'.join([
         (f"{dhatu['dhatu']} ({dhatu['aupadeshik']}), "
          f"{dhatu['artha']}, {dhatu['artha_english']}"),
         (f"{VALUES_LANG['gana'][dhatu['gana']]}, "
          f"{VALUES_LANG['pada'][dhatu['pada']]}, "),
-    ]
+    ])
+
+
+def format_lakara(lakara, forms):
+    import tabulate
+
+    return '\n'.join([
+        LAKARA_LANG[lakara],
+        "```" + tabulate.tabulate(
+            [[', '.join(cell) for cell in row] for row in forms],
+            headers="firstrow",
+            tablefmt="rst",
+            colalign=['left', 'right', 'right']
+        ) + "```"
+    ])
+
 
-    show_lakara = [
-        'plat', 'plang', 'plrut', 'plot',
-        'alat', 'alang', 'alrut', 'alot'
+def conjugation_lakaras(rupaani, full_flag):
+    """Lakaras with forms, parasmaipada first, to be shown one per page"""
+    lakaras = [
+        lakara for lakara, forms in rupaani.items()
+        if forms and (full_flag or lakara in SHOW_LAKARA)
     ]
+    return sorted(lakaras, key=lambda lakara: lakara.startswith('a'))
 
-    p_output = []
-    a_output = []
-    for lakara, forms in rupaani.items():
-        if not full_flag and lakara not in show_lakara:
-            continue
-        if forms:
-            if lakara.startswith('a'):
-                _output = a_output
-            if lakara.startswith('p'):
-                _output = p_output
-
-            _output.append('')
-            _output.append(LAKARA_LANG[lakara])
-            _output.append("```" + tabulate.tabulate(
-                [[', '.join(cell) for cell in row] for row in forms],
-                headers="firstrow",
-                tablefmt="rst",
-                colalign=['left', 'right', 'right']
-            ) + "```")
-
-    # output.append('+' + '-' * 60 + '+',)
-    return ['\n'.join(_output)
-            for _output in [output, p_output, a_output] if _output]
+
+def lakara_label(lakara):
+    """Short name of a lakara for a button, e.g. लट् (प)"""
+    name = LAKARA_LANG[lakara].split('लकारः')[0]
+    pada = 'आ' if lakara.startswith('a') else 'प'
+    return f'{name} ({pada})'
+
+
+# --------------------------------------------------------------------------- #
+# Rendered Responses (lists of messages)
+
+
+def render_help():
+    help_message = [MESSAGE_AVAILABLE_COMMANDS]
+
+    for _, _command in COMMAND_DETAILS.items():
+        if _command["help"]:
+            help_message.append(
+                f"{_command['sanskrit'][0]} or /{_command['command'][0]} - "
+                f"{_command['help.sanskrit']} ({_command['help.english']})"
+            )
+    return ['\n'.join(help_message)]
+
+
+def render_conjugations(dhaatu_idx, dhaatu, lakaras, rupaani, full_flag):
+    """Header, tables of the `lakaras` and the link to all the lakaras"""
+    output = [format_dhatu_header(dhaatu)]
+    output.extend(format_lakara(lakara, rupaani[lakara]) for lakara in lakaras)
+    if not full_flag:
+        # Provide option to check all lakArAH
+        command_key = dhaatu_idx.replace(".", "_")
+        output.append(f'{MESSAGE_ALL_VERB_FORMS} /dr_{command_key}_full')
+    return '\n\n'.join(output)
+
+
+def render_conjugation_page(dhaatu_idx, dhaatu, lakara, forms, full_flag):
+    return [render_conjugations(
+        dhaatu_idx, dhaatu, [lakara], {lakara: forms}, full_flag
+    )]
+
+
+def render_verb_matches(matches):
+    display_message = []
+    for match in matches:
+        match_message, kramanka = format_verb_match(match)
+        kramanka = kramanka.replace(".", "_")
+        display_message.append(
+            f'{match_message}\n{MESSAGE_SHOW_FORMS} /dr_{kramanka}'
+        )
+    return '\n\n'.join(display_message)
+
+
+def render_declensions(root, gender, rupaani):
+    # cached tables are shared, header is modified on a copy
+    rupaani = [row[:] for row in rupaani]
+    rupaani[0][0] = ""
+    return ['\n'.join([
+        f"**प्रातिपदिकम्**: {root}, **लिङ्गम्**: {gender}",
+        format_declensions(rupaani)
+    ])]
 
 ###############################################################################
 # Basic Event Handlers
 
 
-# Debug
-@bot.on(events.NewMessage)
-async def handle_message(event):
-    LOGGER.debug(event)
-
 # Start
-@bot.on(events.NewMessage(pattern='^/start'))
 async def start(event):
     """Send a message when the command /start is issued."""
     LOGGER.debug("START")
-    await event.respond('\n'.join(MESSAGE_INTRODUCTION), parse_mode='html')
+    respond(event, '\n'.join(MESSAGE_INTRODUCTION), parse_mode='html')
 
     # call help handler
     await help_handler(event)
@@ -287,31 +856,21 @@ async def start(event):
 
 
 # Help
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_HELP]["command"])})'
-))
 async def help_handler(event):
     """Display Help Message"""
     LOGGER.debug("HELP")
-    help_message = [MESSAGE_AVAILABLE_COMMANDS]
-
-    for _, _command in COMMAND_DETAILS.items():
-        if _command["help"]:
-            help_message.append(
-                f"{_command['sanskrit'][0]} or /{_command['command'][0]} - "
-                f"{_command['help.sanskrit']} ({_command['help.english']})"
-            )
-    await event.respond('\n'.join(help_message))
+    # independent of the data, available while it is loading
+    help_message = RESPONSES.get((COMMAND_HELP,))
+    if help_message is None:
+        help_message = render_help()
+        RESPONSES.set((COMMAND_HELP,), help_message)
+    for output in help_message:
+        respond(event, output)
 
 
 # Scheme
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_SCHEME]["command"])})'
-))
 async def set_scheme(event):
     '''Set transliteration scheme for user'''
-    global transliteration_scheme
-
     keyboard = []
     current_row = []
     row_length = 2
@@ -331,7 +890,8 @@ async def set_scheme(event):
     response_message = [MESSAGE_CHOOSE_SCHEME]
 
     # Asking user to choose a keyboard scheme
-    await event.respond(
+    respond(
+        event,
         '\n'.join(response_message), buttons=keyboard, parse_mode='html'
     )
 
@@ -343,58 +903,52 @@ async def set_scheme(event):
 # Verb Event Handlers
 
 
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_VERB]["command"])}) '
-))
 async def verb_handler(event):
     _command = COMMAND_DETAILS[COMMAND_VERB]
     search_key = ' '.join(event.text.split()[1:])
     sender_id = event.sender.id
 
     if search_key == "" or len(search_key.split()) > 1:
-        await event.reply(
+        reply(
+            event,
             f'USAGE: /{_command["command"][0]} {_command["argument_text"]}'
         )
     else:
-        search_key = sanscript.transliterate(
+        await within(COMPONENTS.wait('lexicon', 'form_index'), 'loading')
+        check('transliteration')
+        search_key = transliterate(
             search_key,
             get_user_scheme(sender_id),
             TRANSLITERATION_SCHEME_INTERNAL
         )
-        matches = [
-            format_verb_match(match)
-            for match in DHATUPATHA.search(search_key)
-        ]
+        unknown_key = (data_version(), COMMAND_VERB, search_key)
+        if unknown_key in UNKNOWN or (
+            not DHATUPATHA.validate_index(search_key)
+            and COMMAND_VERB not in FORM_INDEX.get(search_key, ())
+        ):
+            matches = []
+        else:
+            matches = await within(
+                async_lookup('search_dhatu', search_key), 'lookup'
+            )
+            if not matches:
+                UNKNOWN.add(unknown_key)
         # print(matches)
         if not matches:
-            await event.respond(MESSAGE_UNKNOWN_VERB)
+            respond(event, MESSAGE_UNKNOWN_VERB)
         else:
-            display_message = []
-            for match in matches:
-                match_message = match[0].split("\n")
-                kramanka = match[1].replace(".", "_")
-
-                match_message.append(
-                    f'{MESSAGE_SHOW_FORMS} '
-                    f'/dr_{kramanka}'
+            await send_first_page(
+                event, paginate_verb_matches(search_key, matches)
+            )
+            CONJUGATIONS.prefetch([
+                (
+                    data_version(),
+                    DHATUPATHA.validate_index(match['dhatu']['baseindex'])
                 )
-                display_message.append('\n'.join(match_message))
-
-            max_char_len = 4096
-            curr_msg = []
-            curr_length = 0
-            for msg in display_message:
-                msg_len = len(msg)
-                if curr_length + msg_len > max_char_len:
-                    await event.respond('\n\n'.join(curr_msg))
-                    curr_msg = []
-                    curr_length = 0
-                curr_msg.append(msg)
-                curr_length = curr_length + msg_len
-            await event.respond('\n\n'.join(curr_msg))
-
-
-@bot.on(events.NewMessage(pattern='^/dr_'))
+                for match in matches[:PREFETCH_CANDIDATES]
+            ])
+
+
 async def conjugation_handler_wrapper(event):
     _bot_command = COMMAND_DETAILS[COMMAND_CONJUGATION]["command"][0]
     words = event.text.split("_")
@@ -405,34 +959,27 @@ async def conjugation_handler_wrapper(event):
     raise events.StopPropagation
 
 
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_CONJUGATION]["command"])}) '
-))
 async def conjugation_handler(event):
     words = event.text.split()
     # print(words)
-    search_key = words[1]
+    search_key = words[1] if len(words) > 1 else ""
     full_flag = KEYWORD_FULL in words
 
     if search_key == "" or len(search_key.split()) > 1:
         pass
     else:
+        await within(COMPONENTS.wait('lexicon'), 'loading')
         dhaatu_idx = DHATUPATHA.validate_index(search_key)
         if dhaatu_idx:
             # print(f"VERBINDEX: {dhaatu_idx}")
-            dhaatu = DHATUPATHA.get(dhaatu_idx)
-            rupaani = DHATUPATHA.get_forms(dhaatu_idx)
-            dhaturupa_output = format_conjugations(dhaatu, rupaani, full_flag)
-            if not full_flag:
-                # Provide option to check all lakArAH
-                command_key = search_key.replace(".", "_")
-                full_command = (
-                    f'\n{MESSAGE_ALL_VERB_FORMS} '
-                    f'/dr_{command_key}_full'
-                )
-                dhaturupa_output.append(full_command)
-            for output in dhaturupa_output:
-                await event.respond(output)
+            dhaatu, rupaani = await within(
+                CONJUGATIONS.get((data_version(), dhaatu_idx)), 'lookup'
+            )
+            pagination = paginate_conjugations(dhaatu_idx, rupaani, full_flag)
+            if pagination.count:
+                await send_first_page(event, pagination)
+            else:
+                respond(event, format_dhatu_header(dhaatu))
         else:
             # print(f"INVALID_VERBINDEX: {dhaatu_idx}")
             pass
@@ -443,29 +990,54 @@ async def conjugation_handler(event):
 # Word Event Handlers
 
 
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_WORD]["command"])}) '
-))
 async def word_handler(event):
     _command = COMMAND_DETAILS[COMMAND_WORD]
     search_key = ' '.join(event.text.split()[1:])
     sender_id = event.sender.id
 
     if search_key == "" or len(search_key.split()) > 1:
-        await event.reply(
+        reply(
+            event,
             f'USAGE: /{_command["command"][0]} {_command["argument_text"]}'
         )
     else:
-        search_key = sanscript.transliterate(
+        from heritage import HERITAGE_LANG
+        import sanskrit_text as skt
+
+        await within(COMPONENTS.wait('lexicon', 'heritage'), 'loading')
+        check('transliteration')
+        search_key = transliterate(
             search_key,
             get_user_scheme(sender_id),
             TRANSLITERATION_SCHEME_INTERNAL
         )
         matches = []
         grouped_matches = {}
+        partial = False
 
-        analyses = Heritage.get_analysis(search_key)
-        for _, solution in analyses.items():
+        unknown_key = (data_version(), COMMAND_WORD, search_key)
+        if unknown_key in UNKNOWN or not is_devanagari(search_key):
+            analyses = None
+        else:
+            try:
+                analyses = await within(
+                    INFLIGHT.run(
+                        ('analysis', search_key),
+                        heritage_call, 'get_analysis', search_key
+                    ),
+                    'heritage'
+                )
+            except DeadlineExceeded as e:
+                # best-effort answer from ShabdaPatha alone
+                LOGGER.warning(f"{e} Answering from ShabdaPatha.")
+                analyses = None
+                grouped_matches = await local_word_matches(search_key)
+                if not grouped_matches:
+                    raise
+                matches = list(grouped_matches)
+                partial = True
+
+        for _, solution in (analyses or {}).items():
             has_gender = False
             for word_analysis in solution['words'][0]:
                 grouped = {}
@@ -511,17 +1083,27 @@ async def word_handler(event):
                         )
 
         if not matches:
-            await event.reply(MESSAGE_UNKNOWN_WORD)
+            if analyses is not None:
+                UNKNOWN.add(unknown_key)
+            reply(event, MESSAGE_UNKNOWN_WORD)
         else:
             # keyboard = []
-            display_message = []
+            display_message = [MESSAGE_PARTIAL] if partial else []
+            candidates = []
             for root, genders in grouped_matches.items():
-                root_en = sanscript.transliterate(
+                root_en = transliterate(
                     root,
                     TRANSLITERATION_SCHEME_INTERNAL,
                     TRANSLITERATION_SCHEME_COMMAND
                 )
+                # root as it will be received back from the /sr_ link
+                command_root = transliterate(
+                    root_en,
+                    TRANSLITERATION_SCHEME_COMMAND,
+                    TRANSLITERATION_SCHEME_INTERNAL
+                )
                 for gender in genders:
+                    candidates.append((command_root, gender))
                     match_message = format_word_match(
                         root, gender, genders[gender]
                     )
@@ -533,14 +1115,18 @@ async def word_handler(event):
 
                     display_message.append('\n'.join(match_message))
 
-            await event.respond(
+            respond(
+                event,
                 '\n\n'.join(display_message), parse_mode='html'
             )
 
+            # exactly the keys that the /sr_ links above request
+            DECLENSIONS.prefetch([
+                (data_version(), root, gender)
+                for root, gender in candidates[:PREFETCH_CANDIDATES]
+            ])
+
 
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_DECLENSION]["command"])}) '
-))
 async def declension_handler(event):
     _command = COMMAND_DETAILS[COMMAND_DECLENSION]
     words = event.text.split()
@@ -549,38 +1135,42 @@ async def declension_handler(event):
         gender = words[2]
 
         # print(f'WORDFORMS: {root} {gender}')
-        shabdapatha_gender = GENDER_MAP[gender].replace('a', 'm')
-        shabda_idx = SHABDAPATHA.get_word(root, shabdapatha_gender)
-        if shabda_idx is not None:
-            rupaani = SHABDAPATHA.get_forms(shabda_idx)
-        else:
-            rupaani = Heritage.get_declensions(root, gender)
-
-        rupaani[0][0] = ""
-        await event.respond('\n'.join([
-            f"**प्रातिपदिकम्**: {root}, **लिङ्गम्**: {gender}",
-            format_declensions(rupaani)
-        ]))
+        await within(COMPONENTS.wait('lexicon', 'heritage'), 'loading')
+        shabdarupa_output = await within(
+            get_response(
+                response_key(COMMAND_DECLENSION, root, gender),
+                declension_response, root, gender
+            ),
+            'lookup'
+        )
+        for output in shabdarupa_output:
+            respond(event, output)
     else:
-        await event.reply(
+        reply(
+            event,
             f'USAGE: /{_command["command"][0]} {_command["argument_text"]}'
         )
     raise events.StopPropagation
 
 
-@bot.on(events.NewMessage(pattern='^/sr_'))
-async def declension_handler_wrapper(event):
-    _bot_command = COMMAND_DETAILS[COMMAND_DECLENSION]["command"][0]
-    words = event.text.split("_")
+def declension_link_arguments(text):
+    """(root, gender) of a /sr_ link"""
+    words = text.split("_")
     # Change back root from ITRANS to devanagari
-    words[1] = sanscript.transliterate(
+    root = transliterate(
         words[1],
         TRANSLITERATION_SCHEME_COMMAND,
         TRANSLITERATION_SCHEME_INTERNAL
     )
     # Fetch gender
-    words[2] = GENDER_MAP[words[2]]
-    event.text = ' '.join([f'/{_bot_command}', words[1], words[2]])
+    gender = GENDER_MAP[words[2]]
+    return root, gender
+
+
+async def declension_handler_wrapper(event):
+    _bot_command = COMMAND_DETAILS[COMMAND_DECLENSION]["command"][0]
+    root, gender = declension_link_arguments(event.text)
+    event.text = ' '.join([f'/{_bot_command}', root, gender])
     await declension_handler(event)
     raise events.StopPropagation
 
@@ -588,48 +1178,107 @@ async def declension_handler_wrapper(event):
 ###############################################################################
 # Segmentation Event Handler
 
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_SEGMENTATION]["command"])}) '
-))
 async def segmentation_handler(event):
     """Output the sandhi split of the input word."""
     _command = COMMAND_DETAILS[COMMAND_SEGMENTATION]
     input_line = ' '.join(event.text.split()[1:])
     sender_id = event.sender.id
-    input_line = sanscript.transliterate(
+    input_line = transliterate(
         input_line,
         get_user_scheme(sender_id),
         TRANSLITERATION_SCHEME_INTERNAL
     )
-    # Limit on IAST text is 128 characters
-    # 115 is just a heuristic approximation for Devanagari text
-    # so that resulting IAST is < 128 length
 
     if input_line == "":
-        await event.reply(
+        reply(
+            event,
             f'USAGE: /{_command["command"][0]} {_command["argument_text"]}'
         )
+    elif VISHLESHANA is None or VISHLESHANA.failed:
+        respond(event, MESSAGE_NO_SEGMENTER)
+    elif not VISHLESHANA.ready:
+        respond(event, MESSAGE_LOADING)
     else:
-        fold_input_line = fold(input_line, width=115)
-        split_output = VISHLESHANA.split(fold_input_line)
-        # print(f"SPLIT: '{input_line}' --> '{split_line}'")
-        await event.respond(split_output)
+        # Chunks as long as the splitter allows, measured in IAST
+        chunks = [
+            chunk
+            for chunk in fold(
+                input_line, width=SPLITTER_MAX_LENGTH, length=iast_length
+            ).split('\n')
+            if chunk.strip()
+        ]
+        semaphore = asyncio.Semaphore(SEGMENTATION_CONCURRENCY)
+
+        async def split_chunk(chunk):
+            async with semaphore:
+                return await INFLIGHT.run(
+                    (COMMAND_SEGMENTATION, chunk),
+                    VISHLESHANA.run, 'split', chunk
+                )
+
+        # Chunks are split as a pipeline, and the reply is edited
+        # as each one of them finishes (in order)
+        tasks = [asyncio.ensure_future(split_chunk(chunk)) for chunk in chunks]
+        try:
+            message = None
+            output = []
+            shown = ''
+            last_edit = 0
+            for idx, task in enumerate(tasks):
+                out_of_time = False
+                try:
+                    split_output = await within(task, 'splitter')
+                except DeadlineExceeded as e:
+                    # the chunks split so far are the answer
+                    LOGGER.warning(f"{e} Split {idx}/{len(tasks)} chunks.")
+                    split_output = MESSAGE_PARTIAL
+                    out_of_time = True
+                except (asyncio.TimeoutError, WorkerError) as e:
+                    LOGGER.warning(f"Split failed: {e!r}")
+                    split_output = ERROR_MESSAGE_COMMON
+
+                output_length = len('\n'.join(output + [split_output]))
+                if output_length > MAX_MESSAGE_LENGTH:
+                    # finish the current message, continue in a new one
+                    if message is not None and '\n'.join(output) != shown:
+                        await message.edit('\n'.join(output))
+                    message = None
+                    output = []
+                output.append(split_output)
+
+                is_last = out_of_time or idx == len(tasks) - 1
+                now = time.monotonic()
+                if message is None:
+                    shown = '\n'.join(output)
+                    # edited later, so it must not be merged with others
+                    message = await respond(event, shown, combine=False)
+                    if message is None:
+                        LOGGER.warning("Could not send the split output.")
+                        break
+                    last_edit = now
+                elif is_last or now - last_edit > SEGMENTATION_EDIT_INTERVAL:
+                    shown = '\n'.join(output)
+                    await message.edit(shown)
+                    last_edit = now
+                if out_of_time:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
 
 ###############################################################################
 # Suggestion Event Handler
 
 
-@bot.on(events.NewMessage(
-    pattern=f'^/({"|".join(COMMAND_DETAILS[COMMAND_SUGGESTION]["command"])}) '
-))
 async def suggestion_handler(event):
     """Give suggestions"""
-    message = event.text
-    sender = await event.get_sender()
-    user_file = os.path.join(config.SUGGESTION_DIR, f"{sender.username}.txt")
-    with open(user_file, 'a') as f:
-        f.write("\n".join([f"--- {datetime.datetime.now()} ---", message, ""]))
-    await event.reply(MESSAGE_SUGGESTION_REPLY)
+    SUGGESTIONS.write({
+        'time': datetime.datetime.now().isoformat(),
+        'sender_id': event.sender_id,
+        'chat_id': event.chat_id,
+        'text': event.text
+    })
+    reply(event, MESSAGE_SUGGESTION_REPLY)
 
 
 ###############################################################################
@@ -652,19 +1301,17 @@ COMMAND_HANDLERS = {
 @bot.on(events.CallbackQuery(pattern=f'^{CALLBACK_PREFIX_SCHEME}_'))
 async def scheme_handler(event):
     """ Invoked from set_scheme() """
-    global transliteration_scheme
     sender_id = event.sender.id
 
-    if sender_id not in transliteration_scheme:
-        transliteration_scheme[sender_id] = {
-            'input': TRANSLITERATION_SCHEME_DEFAULT,
-            'output': TRANSLITERATION_SCHEME_DEFAULT
-        }
-
     data = event.data.decode('utf-8')
-    _, scheme = data.split('_')
+    _, _, scheme = data.partition('_')
 
-    transliteration_scheme[sender_id]['input'] = scheme
+    # callback data comes from the client, it is not trusted
+    if scheme not in TRANSLITERATION_SCHEMES:
+        await event.answer(ERROR_MESSAGE_COMMON, alert=True)
+        raise events.StopPropagation
+
+    PREFERENCES.set(sender_id, 'input', scheme)
 
     # Editing last message, removing keyboard
     last_message = await event.get_message()
@@ -678,7 +1325,7 @@ async def scheme_handler(event):
         MESSAGE_ASK_QUERY
     ]
 
-    await event.respond('\n'.join(response_message))
+    respond(event, '\n'.join(response_message))
     raise events.StopPropagation
 
 
@@ -702,7 +1349,46 @@ async def query_redirect(event):
         if query_id == BUTTONS[_command]["id"]:
             _bot_command = COMMAND_DETAILS[_command]["command"][0]
             event.text = f"/{_bot_command} {text}"
-            await COMMAND_HANDLERS[_command](event)
+            await schedule(event, COMMAND_HANDLERS[_command])
+
+
+@bot.on(events.CallbackQuery(
+    pattern=f'^{CALLBACK_PREFIX_PAGE}{CALLBACK_SEPARATOR}')
+)
+async def page_handler(event):
+    """ Invoked from the buttons of a paginated result """
+    data = event.data.decode('utf-8')
+    try:
+        _, handle, page = data.split(CALLBACK_SEPARATOR)
+    except ValueError:
+        await event.answer(ERROR_MESSAGE_COMMON, alert=True)
+        return
+
+    pagination = PAGES.get(handle)
+    if pagination is None:
+        await event.answer(MESSAGE_PAGE_EXPIRED, alert=True)
+        return
+
+    if page == PAGE_DOCUMENT and pagination.document is not None:
+        await event.answer()
+        respond(event, '', file=await pagination.as_document())
+        return
+
+    # callback data comes from the client, it is not trusted
+    idx = int(page) if page.isdigit() else -1
+    if not 0 <= idx < pagination.count:
+        await event.answer(ERROR_MESSAGE_COMMON, alert=True)
+        return
+    await event.answer()
+
+    try:
+        await event.edit(
+            await pagination.page(idx),
+            buttons=page_buttons(handle, pagination, idx)
+        )
+    except MessageNotModifiedError:
+        # the button of the page being shown
+        pass
 
 
 ###############################################################################
@@ -724,60 +1410,330 @@ def make_buttons(event_text, _buttons, _prefix, _separator):
     return buttons
 
 
-@bot.on(events.NewMessage(pattern='^[^/]'))
 async def process_non_command(event):
-    """Handle messages that do not start with /"""
-    event_text = event.text
+    """
+    Answer a message that is not a command, if it is a single word that is
+    known to only one of DhatuPatha and ShabdaPatha.
+    Otherwise, offer the types of query.
+    """
+    words = event.text.split()
+    if len(words) == 1 and COMPONENTS.is_ready('form_index'):
+        query = transliterate(
+            words[0],
+            get_user_scheme(event.sender_id),
+            TRANSLITERATION_SCHEME_INTERNAL
+        )
+        commands = FORM_INDEX.get(query, ())
+        if len(commands) == 1:
+            _command = commands[0]
+            _bot_command = COMMAND_DETAILS[_command]["command"][0]
+            event.text = f"/{_bot_command} {words[0]}"
+            await schedule(event, COMMAND_HANDLERS[_command])
+            return
+
+    _buttons = [
+        [BUTTONS[COMMAND_WORD], BUTTONS[COMMAND_VERB]],
+        [BUTTONS[COMMAND_SEGMENTATION]],
+        [BUTTONS[COMMAND_HELP]]
+    ]
+    buttons = make_buttons(
+        event.text,
+        _buttons=_buttons,
+        _prefix=CALLBACK_PREFIX_QUERY,
+        _separator=CALLBACK_SEPARATOR
+    )
+    reply(event, MESSAGE_CHOOSE_TYPE, buttons=buttons)
+
+
+###############################################################################
+# Data Reload
+#
+# The data files are read again in the background, and the new DhatuPatha,
+# ShabdaPatha and the indexes derived from them replace the old ones all at
+# once, on the event loop. Cache keys include data_version(), so nothing
+# derived from the old data is served after the swap.
+
+RELOAD_KEY = ('reload',)
+
+
+def build_data():
+    """All the data read from the files, None if it has not changed"""
+    dhatupatha = read_dhatupatha()
+    shabdapatha = read_shabdapatha()
+    if (dhatupatha.version, shabdapatha.version) == (
+        DHATUPATHA.version, SHABDAPATHA.version
+    ):
+        return None
+    return (
+        dhatupatha,
+        shabdapatha,
+        make_form_index(dhatupatha, shabdapatha)
+    )
+
+
+def swap_data(data, lexicon, pool):
+    """Replace the data and the lookups on it, return the replaced pool"""
+    global DHATUPATHA, SHABDAPATHA, FORM_INDEX, LEXICON, LEXICON_POOL
+    DHATUPATHA, SHABDAPATHA, FORM_INDEX = data
+    LEXICON = lexicon
+    old_pool, LEXICON_POOL = LEXICON_POOL, pool
+    return old_pool
+
+
+async def retire_pool(pool):
+    """Close a replaced pool, once the calls already sent to it are done"""
+    await asyncio.sleep(config.LEXICON_TIMEOUT)
+    await asyncio.get_running_loop().run_in_executor(None, pool.close)
+
+
+def log_failure(future):
+    """Done callback of a background job, nobody else sees its exception"""
+    if not future.cancelled() and future.exception() is not None:
+        LOGGER.error("Background job failed.", exc_info=future.exception())
+
+
+async def reload_data():
+    """
+    Reload the data files, if they have changed
+
+    Returns
+    -------
+    bool
+        True if the data was reloaded, False if it is unchanged
+    """
+    await COMPONENTS.wait('lexicon')
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    data = await loop.run_in_executor(None, build_data)
+    if data is None:
+        LOGGER.info("Data is unchanged.")
+        return False
+
+    lexicon = Lexicon(*data[:2])
+    pool = None
+    if LEXICON_POOL is not None:
+        # workers forked from the new data share it with this process,
+        # instead of each unpickling a copy of it
+        pool = await loop.run_in_executor(None, functools.partial(
+            prefork, lexicon, config.LEXICON_WORKERS,
+            timeout=config.LEXICON_TIMEOUT
+        ))
+
+    old_version = data_version()
+    old_pool = swap_data(data, lexicon, pool)
+    if old_pool is not None:
+        asyncio.ensure_future(retire_pool(old_pool)).add_done_callback(
+            log_failure
+        )
+    LOGGER.info(
+        f"Reloaded data {old_version} as {data_version()} "
+        f"in {time.perf_counter() - start:.3f}s."
+    )
+
+    # entries of the old version can no longer be hit
+    for cache in [RESPONSES, CONJUGATIONS.cache, DECLENSIONS.cache, UNKNOWN]:
+        cache.clear()
+    loop.run_in_executor(None, prewarm_responses).add_done_callback(
+        log_failure
+    )
+    return True
+
+
+async def request_reload():
+    """Reload the data once, however many times it is requested at once"""
+    try:
+        return await INFLIGHT.run(RELOAD_KEY, reload_data)
+    except Exception:
+        LOGGER.exception("Could not reload the data.")
+        return None
+
+
+async def reload_handler(event):
+    """Reload the data files (only for config.ADMINS)"""
+    if event.sender_id not in config.ADMINS:
+        return
+
+    respond(event, MESSAGE_RELOADING)
+    reloaded = await request_reload()
+    if reloaded is None:
+        respond(event, MESSAGE_RELOAD_FAILED)
+    elif reloaded:
+        respond(event, f'{MESSAGE_RELOADED} ({data_version()})')
+    else:
+        respond(event, MESSAGE_RELOAD_UNCHANGED)
 
-    # print(f"Search: {event_text}")
-    keys = event_text.split()
 
-    command_found = False
+###############################################################################
+# Router
+#
+# All messages are dispatched by a single handler, which finds the command
+# at the start of the message in a trie of command names and aliases.
+# Routes are (handler, arguments), where `arguments` is the number of
+# arguments expected after an alias (-1 for any, None for no check).
+
+ROUTES = CommandTrie()
+ROUTES.add('/start', (start, None))
+ROUTES.add('/reload', (reload_handler, None))
+for _name in COMMAND_DETAILS[COMMAND_SCHEME]["command"]:
+    ROUTES.add(f'/{_name}', (set_scheme, None))
+ROUTES.add('/dr_', (conjugation_handler_wrapper, None), prefix=True)
+ROUTES.add('/sr_', (declension_handler_wrapper, None), prefix=True)
+for _command_id, _handler in COMMAND_HANDLERS.items():
+    for _name in COMMAND_DETAILS[_command_id]["command"]:
+        ROUTES.add(f'/{_name}', (_handler, None))
+
+
+def load_aliases():
+    """Add the aliases of commands, Sanskrit ones in every scheme"""
     for _command_id, _handler in COMMAND_HANDLERS.items():
         _command = COMMAND_DETAILS[_command_id]
-        LOGGER.info(_command_id)
-        LOGGER.info(_command)
-        _commands = [
-            sanscript.transliterate(
+        aliases = {
+            transliterate(
                 sanskrit_word,
                 TRANSLITERATION_SCHEME_INTERNAL,
                 output_scheme
             )
             for sanskrit_word in _command["sanskrit"]
             for output_scheme in TRANSLITERATION_SCHEMES
-        ] + _command["english"]
-
-        if keys[0] in _commands:
-            if _command["arguments"] == -1:
-                command_found = True
-                await _handler(event)
-            elif len(keys[1:]) == _command["arugments"]:
-                command_found = True
-                await _handler(event)
-            else:
-                await event.respond(ERROR_MESSAGE_ARGUMENT_MISTMATCH)
-                await help_handler(event)
-
-    if not command_found:
-        _buttons = [
-            [BUTTONS[COMMAND_WORD], BUTTONS[COMMAND_VERB]],
-            [BUTTONS[COMMAND_SEGMENTATION]],
-            [BUTTONS[COMMAND_HELP]]
-        ]
-        buttons = make_buttons(
-            event_text,
-            _buttons=_buttons,
-            _prefix=CALLBACK_PREFIX_QUERY,
-            _separator=CALLBACK_SEPARATOR
-        )
-        await event.reply(MESSAGE_CHOOSE_TYPE, buttons=buttons)
+        }
+        aliases.update(_command["english"])
+        for alias in aliases:
+            ROUTES.add(alias, (_handler, _command["arguments"]))
+    return ROUTES
+
+
+COMPONENTS.add(
+    'aliases', load_aliases, depends=['transliteration']
+)
+
+# --------------------------------------------------------------------------- #
+# Handlers are run in lanes, so that slow requests do not delay fast ones
+
+SCHEDULER = Scheduler([
+    Lane(
+        LANE_FAST,
+        concurrency=FAST_LANE_CONCURRENCY,
+        queue_size=FAST_LANE_QUEUE_SIZE,
+        user_rate=FAST_LANE_USER_RATE,
+        user_burst=FAST_LANE_USER_BURST
+    ),
+    Lane(
+        LANE_SLOW,
+        concurrency=SLOW_LANE_CONCURRENCY,
+        queue_size=SLOW_LANE_QUEUE_SIZE,
+        user_rate=SLOW_LANE_USER_RATE,
+        user_burst=SLOW_LANE_USER_BURST
+    ),
+])
+
+LANE_DEADLINES = {
+    LANE_FAST: FAST_LANE_DEADLINE,
+    LANE_SLOW: SLOW_LANE_DEADLINE,
+}
+
+
+def declension_lane(root, gender):
+    """
+    Lane of a declension request
+
+    Fast if the declensions are cached (e.g. prefetched after a search
+    reply), slow if the Heritage Platform has to be called.
+    """
+    if DHATUPATHA is None or SHABDAPATHA is None:
+        return LANE_SLOW
+    if (
+        response_key(COMMAND_DECLENSION, root, gender) in RESPONSES
+        or (data_version(), root, gender) in DECLENSIONS.cache
+    ):
+        return LANE_FAST
+    return LANE_SLOW
+
+
+def declension_command_lane(event):
+    words = event.text.split()
+    if len(words) != 3:
+        return LANE_FAST
+    return declension_lane(words[1], words[2])
+
+
+def declension_link_lane(event):
+    try:
+        root, gender = declension_link_arguments(event.text)
+    except (IndexError, KeyError):
+        return LANE_FAST
+    return declension_lane(root, gender)
+
+
+# Handlers not listed here are in the fast lane,
+# a function picks the lane of the handler for the event
+HANDLER_LANES = {
+    word_handler: LANE_SLOW,
+    declension_handler: declension_command_lane,
+    declension_handler_wrapper: declension_link_lane,
+    segmentation_handler: LANE_SLOW,
+}
+
+
+async def schedule(event, handler):
+    """
+    Run a handler in its lane, within the deadline of the lane,
+    or reply that the bot is busy
+    """
+    lane = HANDLER_LANES.get(handler, LANE_FAST)
+    if callable(lane):
+        lane = lane(event)
+    try:
+        with request_context(LANE_DEADLINES[lane], handler.__name__):
+            await SCHEDULER.run(lane, event.sender_id, handler, event)
+    except DeadlineExceeded as e:
+        LOGGER.warning(str(e))
+        respond(event, MESSAGE_DEADLINE_EXCEEDED)
+    except RateLimited:
+        respond(event, MESSAGE_RATE_LIMITED)
+    except Overloaded:
+        LOGGER.warning(f"Shedding load: {SCHEDULER.report()}")
+        respond(event, MESSAGE_BUSY)
+    except ComponentError as e:
+        LOGGER.error(str(e))
+        respond(event, ERROR_MESSAGE_COMMON)
+
+# --------------------------------------------------------------------------- #
+
+
+@bot.on(events.NewMessage)
+async def router(event):
+    """Dispatch a message to the handler of its command"""
+    LOGGER.debug(event)
+    text = event.text
+    if not text:
+        return
+
+    is_command = text.startswith('/')
+    if not is_command:
+        await COMPONENTS.wait('aliases')
+
+    route = ROUTES.match(text)
+    if route is None:
+        if not is_command:
+            await process_non_command(event)
+        return
+
+    (handler, arguments), end = route
+    if arguments in [None, -1] or len(text[end:].split()) == arguments:
+        await schedule(event, handler)
+    else:
+        respond(event, ERROR_MESSAGE_ARGUMENT_MISTMATCH)
+        await help_handler(event)
+        await process_non_command(event)
 
 
 ###############################################################################
 
 
 def start_bot(client):
+    start = time.perf_counter()
     client.start(bot_token=config.TelegramConfig.bot_token)
+    LOGGER.info(f"Connected in {time.perf_counter() - start:.3f}s.")
     try:
         client.run_until_disconnected()
     except ConnectionError as e:
@@ -793,7 +1749,36 @@ def main():
             config.TelegramConfig.dc_server_address,
             config.TelegramConfig.dc_port
         )
-    start_bot(bot)
+    if config.LEXICON_WORKERS:
+        # forked before any thread is started
+        COMPONENTS.load('lexicon')
+    COMPONENTS.start()
+    PREFERENCES.start()
+    if VISHLESHANA is not None:
+        VISHLESHANA.start()
+    if hasattr(signal, 'SIGHUP'):
+        bot.loop.add_signal_handler(
+            signal.SIGHUP, lambda: asyncio.ensure_future(request_reload())
+        )
+    try:
+        start_bot(bot)
+    finally:
+        bot.loop.run_until_complete(OUTBOX.close())
+        bot.loop.run_until_complete(SUGGESTIONS.close())
+        PREFERENCES.close()
+        HERITAGE_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        LOOKUP_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        if LEXICON_POOL is not None:
+            LEXICON_POOL.close()
+        LOGGER.info(CACHE_BUDGET.report())
+        if VISHLESHANA is not None:
+            # split caches live in the workers, one report for each
+            for future in VISHLESHANA.broadcast('report'):
+                try:
+                    LOGGER.info(future.result(timeout=5))
+                except Exception as e:
+                    LOGGER.warning(f"No split cache report ({e}).")
+            VISHLESHANA.close()
 
 ###############################################################################
 
@@ -15,10 +15,39 @@ DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'data')
 
 DHATU_FILE = os.path.join(DATA_DIR, 'dhatu.json')
 SHABDA_FILE = os.path.join(DATA_DIR, 'shabda.json')
+# Processes forked after loading the data, sharing its memory, to serve
+# searches and tables on more cores (0 serves them in the bot process)
+LEXICON_WORKERS = 0
+LEXICON_TIMEOUT = 10
+# Telegram user IDs allowed to /reload the data files (or send SIGHUP)
+ADMINS = []
 
 HELLWIG_SPLITTER_DIR = ''
+# Splitter worker processes, each with its own model
+SPLITTER_WORKERS = 1
+SPLITTER_TIMEOUT = 60
+# TensorFlow session of the splitter (0 lets TensorFlow decide)
+# `python -m utils.splitter --optimize` benchmarks the settings
+SPLITTER_INTRA_OP_THREADS = 0
+SPLITTER_INTER_OP_THREADS = 0
+SPLITTER_OPTIMIZE = False
+# On-disk cache of split lines, shared by the workers (empty for memory only)
+SPLITTER_CACHE_FILE = os.path.join(HOME_DIR, '.cache', 'vaiyyakarana',
+                                   'splits.sqlite3')
 HERITAGE_PLATFORM_DIR = ''
+# Heritage Platform mirror used in web mode (empty for the INRIA website)
+# e.g. the stand-in server, `python -m tests.heritage_server`
+HERITAGE_BASE_URL = os.environ.get('HERITAGE_BASE_URL', '')
 SUGGESTION_DIR = 'suggestions'
+# Memory budget shared by the lookup and response caches of the bot
+CACHE_MEMORY_BYTES = 128 * 1024 * 1024
+# Dhatus (index) whose conjugation tables are rendered at startup
+# e.g. ['01.0001', '02.0001']
+RESPONSE_PREWARM_DHATUS = []
+# User preferences (e.g. transliteration scheme), shared by all processes
+PREFERENCES_FILE = os.path.join(HOME_DIR, '.local', 'share', 'vaiyyakarana',
+                                'preferences.sqlite3')
+PREFERENCES_SYNC_INTERVAL = 2.0
 
 VERBOSE = True
 DEBUG = False
@@ -25,8 +25,18 @@ MESSAGE_UNKNOWN_WORD = "तत् शब्दम् शब्दरूपम्
 MESSAGE_UNKNOWN_VERB = "तम् धातुम् धातुरूपम् वा न जानामि।"
 
 MESSAGE_NO_SEGMENTER = "विश्लेषणयन्त्राभावात् दत्तपदानां विश्लेषणं कर्तुं न शक्यते।"
+MESSAGE_LOADING = "विश्लेषणयन्त्रं सज्जीक्रियते। क्षणानन्तरं प्रयतताम्।"
+MESSAGE_BUSY = "इदानीं बहवः प्रश्नाः सन्ति। कृपया क्षणानन्तरं प्रयतताम्।"
+MESSAGE_RATE_LIMITED = "अतिशीघ्रं पृच्छति भवान्। कृपया क्षणं विरमतु।"
 MESSAGE_CHOOSE_TYPE = "दत्तपदस्य प्रकारं वृणोतु –"
 MESSAGE_SUGGESTION_REPLY = "समीचीना सूचना। धन्यवादः।"
+MESSAGE_PAGE_EXPIRED = "अयं परिणामः पुरातनः। कृपया पुनः पृच्छतु।"
+MESSAGE_RELOADING = "दत्तांशः पुनः आरोप्यते।"
+MESSAGE_RELOADED = "नूतनः दत्तांशः आरोपितः।"
+MESSAGE_RELOAD_UNCHANGED = "दत्तांशे परिवर्तनं नास्ति।"
+MESSAGE_RELOAD_FAILED = "दत्तांशः आरोपयितुं न शक्यते।"
+MESSAGE_DEADLINE_EXCEEDED = "समयः समाप्तः। कृपया क्षणानन्तरं प्रयतताम्।"
+MESSAGE_PARTIAL = "समयाभावात् उत्तरम् अपूर्णम्।"
 
 ###############################################################################
 
@@ -131,6 +141,7 @@ COMMAND_DETAILS = {
 CALLBACK_SEPARATOR = "___"
 CALLBACK_PREFIX_SCHEME = "scheme"
 CALLBACK_PREFIX_QUERY = "query"
+CALLBACK_PREFIX_PAGE = "page"
 
 ###############################################################################
 
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Heritage Platform Latency Benchmark
+
+Drives the handlers of the bot that depend on the Heritage Platform
+(`word_handler` for /shabda, `declension_handler` for /shabdarupa) with
+fake events, against the stand-in Heritage server, and reports the latency
+until the reply under concurrency, for cold, burst and warm requests, and
+the kinds of replies sent.
+
+Repeated queries of a word the Heritage Platform has no analysis of go
+through the negative cache. With --fail-rate, a phase of new words is run
+while that fraction of Heritage requests fail (an outage), followed by the
+same words with the platform back up, to show what users get during and
+after the outage.
+
+Replies are collected instead of being sent, so no Telegram connection is
+needed. The data files and config.py of the bot are used as they are.
+The recordings of the stand-in server are synthetic (see heritage_server).
+
+Usage:
+    python -m tests.benchmark_heritage --requests 100 --concurrency 16 \
+        --latency 0.3 --jitter 0.1 --error-rate 0.01 --fail-rate 0.5
+"""
+
+###############################################################################
+
+import time
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+
+from telethon import events
+
+from constants import (
+    MESSAGE_UNKNOWN_WORD, MESSAGE_PARTIAL, MESSAGE_DEADLINE_EXCEEDED,
+    ERROR_MESSAGE_COMMON
+)
+from tests.heritage_server import HeritageServer
+
+###############################################################################
+
+CONSONANTS = 'कखगघचजटडतदनपबभमयरलवशसह'
+
+# a word with a (synthetic) recording without any analysis
+UNKNOWN_WORD = 'क्ष्क्ष्'
+
+###############################################################################
+
+
+def make_words(count, offset=0):
+    """Distinct (synthetic) अकारान्त words"""
+    words = []
+    n = len(CONSONANTS)
+    for idx in range(offset, offset + count):
+        a, b = divmod(idx, n)
+        words.append(CONSONANTS[a % n] + 'ा' + CONSONANTS[b])
+    return words
+
+
+def summary(name, latencies, elapsed, kinds=None):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{name:>12}: n={len(latencies):<5} "
+        f"p50={statistics.median(latencies) * 1000:8.1f}ms "
+        f"p95={p95 * 1000:8.1f}ms "
+        f"max={latencies[-1] * 1000:8.1f}ms "
+        f"wall={elapsed:6.2f}s"
+    )
+    if kinds is not None:
+        print(f"{'':>12}  replies: {dict(kinds)}")
+        kinds.clear()
+
+###############################################################################
+
+
+class FakeSender:
+    def __init__(self, sender_id):
+        self.id = sender_id
+
+
+class FakeEvent:
+    def __init__(self, text, sender_id):
+        """NewMessage event with the attributes used by the handlers"""
+        self.text = text
+        self.id = sender_id
+        self.sender_id = sender_id
+        self.sender = FakeSender(sender_id)
+        self.chat_id = sender_id
+        self.input_chat = None
+
+
+class ReplyCollector:
+    def __init__(self):
+        """Stand-in for the Outbox, counts the replies instead of sending"""
+        self.stats = Counter()
+        self.kinds = Counter()
+
+    def send(self, chat_id, text, entity=None, **kwargs):
+        self.stats['replies'] += 1
+        if text == MESSAGE_UNKNOWN_WORD:
+            self.kinds['unknown'] += 1
+        elif text.startswith(MESSAGE_PARTIAL):
+            self.kinds['partial'] += 1
+        elif text in [MESSAGE_DEADLINE_EXCEEDED, ERROR_MESSAGE_COMMON]:
+            self.kinds['error'] += 1
+        else:
+            self.kinds['answer'] += 1
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    async def close(self):
+        pass
+
+###############################################################################
+
+
+async def run(handler, texts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = Counter()
+
+    async def request(idx, text):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await handler(FakeEvent(text, idx))
+            except events.StopPropagation:
+                pass
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        request(idx, text) for idx, text in enumerate(texts)
+    ])
+    if errors:
+        print(f"errors: {dict(errors)}")
+    return latencies, time.perf_counter() - start
+
+
+async def benchmark(bot, server, n_requests, concurrency, fail_rate):
+    await bot.COMPONENTS.wait('lexicon', 'heritage')
+    kinds = bot.OUTBOX.kinds
+
+    words = make_words(n_requests)
+    queries = [f'/shabda {word}ः' for word in words]
+    summary(
+        'cold word', *await run(bot.word_handler, queries, concurrency), kinds
+    )
+    burst = [queries[0]] * n_requests
+    summary(
+        'burst word', *await run(bot.word_handler, burst, concurrency), kinds
+    )
+
+    # the first query finds no analysis, the others hit the negative cache
+    unknown = [f'/shabda {UNKNOWN_WORD}'] * n_requests
+    served = server.stats['served']
+    summary(
+        'unknown word',
+        *await run(bot.word_handler, unknown, concurrency),
+        kinds
+    )
+    print(
+        f"{'':>12}  Heritage requests: {server.stats['served'] - served}, "
+        f"negative cache: {bot.UNKNOWN._cache.stats['hits']} hits"
+    )
+
+    if fail_rate:
+        outage = [
+            f'/shabda {word}ः' for word in make_words(n_requests, n_requests)
+        ]
+        error_rate = server.error_rate
+        server.error_rate = fail_rate
+        try:
+            summary(
+                'outage word',
+                *await run(bot.word_handler, outage, concurrency),
+                kinds
+            )
+        finally:
+            server.error_rate = error_rate
+        summary(
+            'after outage',
+            *await run(bot.word_handler, outage, concurrency),
+            kinds
+        )
+
+    gender = 'पुंलिङ्गम्'
+    tables = [f'/shabdarupa {word} {gender}' for word in words]
+    summary(
+        'cold table',
+        *await run(bot.declension_handler, tables, concurrency),
+        kinds
+    )
+    summary(
+        'warm table',
+        *await run(bot.declension_handler, tables, concurrency),
+        kinds
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with HeritageServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        fallback=True,
+        seed=args.seed
+    ) as server:
+        import config
+        config.HERITAGE_PLATFORM_DIR = ''
+        config.HERITAGE_BASE_URL = server.base_url
+        import bot
+
+        collector = ReplyCollector()
+        bot.OUTBOX = collector
+        bot.COMPONENTS.start()
+        asyncio.run(benchmark(
+            bot, server, args.requests, args.concurrency, args.fail_rate
+        ))
+        print(f"replies: {dict(collector.stats)}")
+        print(f"server: {dict(server.stats)}")
+
+
+if __name__ == '__main__':
+    main()
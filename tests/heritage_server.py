@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in Heritage Platform Server
+
+Serves recorded responses of the Heritage Platform CGI scripts over HTTP,
+with configurable latency, jitter and error rate, for offline and
+reproducible tests and benchmarks.
+
+The bot (web mode) is pointed at it through `HERITAGE_BASE_URL` in config.py,
+    HERITAGE_BASE_URL = 'http://127.0.0.1:8091/cgi-bin/SKT/'
+
+Usage:
+    python -m tests.heritage_server --port 8091 --latency 0.5 --jitter 0.2
+    python -m tests.heritage_server --port 8091 --record
+
+In record mode, requests without a recording are proxied to the upstream
+Heritage Platform and the responses are saved to the recordings file.
+
+The bundled recordings are synthetic (marked "synthetic" in the file):
+they are written by hand in the page format that heritage parses, as the
+upstream platform could not be reached when they were made. Timings
+measured against them exercise the bot, not the markup of real pages.
+Responses served from synthetic recordings are counted in `stats`.
+"""
+
+###############################################################################
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import posixpath
+import threading
+import urllib.parse
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+###############################################################################
+
+RECORDINGS_FILE = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    'data', 'heritage_responses.json'
+)
+UPSTREAM_URL = 'https://sanskrit.inria.fr/cgi-bin/SKT/'
+BASE_PATH = '/cgi-bin/SKT/'
+
+###############################################################################
+
+
+class HeritageRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        action = posixpath.basename(url.path)
+        query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+
+        self.server.delay()
+        if self.server.should_fail():
+            self.server.count('error')
+            return self.respond(503, 'Service Unavailable')
+
+        recording = self.server.find(action, query)
+        if recording is None and self.server.upstream:
+            recording = self.server.fetch(action, url.query)
+
+        if recording is None:
+            self.server.count('missing')
+            return self.respond(404, f'No recording for {action}?{url.query}')
+
+        self.server.count('served')
+        if recording.get('synthetic'):
+            self.server.count('synthetic')
+        return self.respond(recording['status'], recording['body'])
+
+    def respond(self, status, body):
+        content = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(format % args)
+
+
+###############################################################################
+
+
+class HeritageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address=('127.0.0.1', 0),
+        recordings_file=RECORDINGS_FILE,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        fallback=False,
+        upstream=None,
+        seed=None
+    ):
+        """
+        Stand-in for the Heritage Platform web interface
+
+        Parameters
+        ----------
+        address : tuple, optional
+            (host, port) to listen on. Port 0 picks a free port.
+            The default is ('127.0.0.1', 0).
+        recordings_file : str, optional
+            JSON file with the recorded responses.
+            The default is RECORDINGS_FILE.
+        latency : float, optional
+            Delay (in seconds) added to every response.
+            The default is 0.0.
+        jitter : float, optional
+            Random delay (in seconds) of up to `jitter` added on top of
+            `latency`. The default is 0.0.
+        error_rate : float, optional
+            Fraction of requests answered with HTTP 503.
+            The default is 0.0.
+        fallback : bool, optional
+            If True, a request without an exact recording is answered with
+            any recording of the same CGI script, which allows load tests
+            with arbitrary words. The default is False.
+        upstream : str, optional
+            URL of a Heritage Platform to record missing responses from.
+            The default is None.
+        seed : int, optional
+            Seed for the latency jitter and error injection.
+            The default is None.
+        """
+        super().__init__(address, HeritageRequestHandler)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.recordings_file = recordings_file
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fallback = fallback
+        self.upstream = upstream
+        self.random = random.Random(seed)
+        self.stats = Counter()
+
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.recordings = []
+        if os.path.isfile(recordings_file):
+            with open(recordings_file, encoding='utf-8') as f:
+                self.recordings = json.load(f)
+
+    # ----------------------------------------------------------------------- #
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{BASE_PATH}'
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def delay(self):
+        with self._lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self):
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+    # ----------------------------------------------------------------------- #
+
+    def find(self, action, query):
+        """Find a recording of `action` whose query is a subset of `query`"""
+        candidates = [
+            recording for recording in self.recordings
+            if recording['action'] == action
+        ]
+        for recording in candidates:
+            if all(
+                query.get(key) == value
+                for key, value in recording['query'].items()
+            ):
+                return recording
+        if self.fallback and candidates:
+            return candidates[0]
+        return None
+
+    def fetch(self, action, query_string):
+        """Fetch a response from upstream and add it to the recordings"""
+        url = urllib.parse.urljoin(self.upstream, action)
+        response = requests.get(f'{url}?{query_string}')
+        recording = {
+            'action': action,
+            'query': dict(
+                urllib.parse.parse_qsl(query_string, keep_blank_values=True)
+            ),
+            'status': response.status_code,
+            'body': response.content.decode('utf-8', errors='replace')
+        }
+        if response.status_code == 200:
+            with self._lock:
+                self.recordings.append(recording)
+                with open(self.recordings_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.recordings, f, ensure_ascii=False, indent=2)
+            self.count('recorded')
+        return recording
+
+    # ----------------------------------------------------------------------- #
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+###############################################################################
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8091)
+    parser.add_argument('--recordings', default=RECORDINGS_FILE)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--fallback', action='store_true')
+    parser.add_argument('--record', action='store_true')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = HeritageServer(
+        (args.host, args.port),
+        recordings_file=args.recordings,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        fallback=args.fallback,
+        upstream=UPSTREAM_URL if args.record else None,
+        seed=args.seed
+    )
+    print(f"Serving Heritage Platform at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(dict(server.stats))
+
+
+if __name__ == '__main__':
+    main()
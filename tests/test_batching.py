@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from utils.batching import BatchScheduler
+
+
+class Recorder:
+    def __init__(self, fail=None):
+        """Records the batches it processes, failing those with `fail`"""
+        self.fail = fail
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail in items:
+            raise ValueError(self.fail)
+        return [item.upper() for item in items]
+
+
+def test_results_in_order():
+    process = Recorder()
+    batcher = BatchScheduler(process, bucket_width=4)
+    items = ['ccccccccc', 'a', 'bbbbb', 'dd']
+    assert batcher.submit(items).result() == [item.upper() for item in items]
+    batcher.close()
+
+
+def test_concurrent_requests_batched():
+    process = Recorder()
+    batcher = BatchScheduler(process, max_wait=0.2, bucket_width=100)
+    futures = []
+    threads = [
+        threading.Thread(target=lambda idx=idx: futures.append(
+            batcher.submit([str(idx)])
+        ))
+        for idx in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(future.result()[0] for future in futures) == list('0123')
+    assert len(process.batches) == 1
+    batcher.close()
+
+
+def test_buckets_by_length():
+    process = Recorder()
+    batcher = BatchScheduler(process, bucket_width=4)
+    batcher.submit(['a', 'bbbbbb', 'cc', 'dddddd', 'e']).result()
+    assert process.batches == [['a', 'e', 'cc'], ['bbbbbb', 'dddddd']]
+    batcher.close()
+
+
+def test_max_batch_size():
+    process = Recorder()
+    batcher = BatchScheduler(process, max_batch_size=2)
+    batcher.submit(['a', 'b', 'c']).result()
+    assert [len(batch) for batch in process.batches] == [2, 1]
+    batcher.close()
+
+
+def test_failure_limited_to_bucket():
+    process = Recorder(fail='bad')
+    batcher = BatchScheduler(process, max_wait=0.2, bucket_width=4)
+    failing = batcher.submit(['bad'])
+    passing = batcher.submit(['xxxxxxxx'])
+    with pytest.raises(ValueError):
+        failing.result()
+    assert passing.result() == ['XXXXXXXX']
+    assert len(process.batches) == 2
+    batcher.close()
+
+
+def test_empty_request():
+    batcher = BatchScheduler(Recorder())
+    assert batcher.submit([]).result() == []
+    batcher.close()
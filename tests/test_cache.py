@@ -0,0 +1,156 @@
+import time
+import asyncio
+
+from utils.cache import Cache, MemoryBudget, NegativeCache, DiskCache
+
+
+def test_lru_eviction():
+    cache = Cache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.stats['evictions'] == 1
+
+
+def test_ttl_expiry():
+    cache = Cache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.stats['expirations'] == 1
+
+
+def test_max_bytes():
+    cache = Cache(maxsize=None, max_bytes=10, sizeof=len)
+    assert not cache.set('big', 'x' * 11)
+    cache.set('a', 'x' * 6)
+    cache.set('b', 'x' * 6)
+    assert 'a' not in cache and 'b' in cache
+    assert cache.nbytes == 6
+
+
+def test_budget_eviction_across_caches():
+    budget = MemoryBudget(10)
+    first = Cache('first', maxsize=None, budget=budget, sizeof=len)
+    second = Cache('second', maxsize=None, budget=budget, sizeof=len)
+    first.set('a', 'xxxx')
+    second.set('b', 'xxxx')
+    first.get('a')
+    # the least recently used entry is in the other cache
+    first.set('c', 'xxxx')
+    assert 'a' in first and 'c' in first
+    assert 'b' not in second
+    assert budget.nbytes == 8
+    assert second.nbytes == 0
+
+
+def test_budget_clear():
+    budget = MemoryBudget(100)
+    cache = Cache(budget=budget, sizeof=len)
+    cache.set('a', 'xxxx')
+    cache.clear()
+    assert budget.nbytes == 0
+
+
+def test_tinylfu_rejects_infrequent():
+    cache = Cache(maxsize=2, policy='tinylfu')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    for _ in range(5):
+        cache.get('a')
+        cache.get('b')
+    # requested once, less frequently than the entry it would evict
+    assert not cache.set('c', 3)
+    assert 'c' not in cache
+    assert cache.stats['rejections'] == 1
+
+
+def test_tinylfu_admits_frequent():
+    cache = Cache(maxsize=2, policy='tinylfu')
+    cache.set('a', 1)
+    cache.set('b', 2)
+    for _ in range(5):
+        cache.get('c')
+    assert cache.set('c', 3)
+    assert 'c' in cache
+    assert 'a' not in cache
+
+
+def test_tinylfu_replaces_existing():
+    cache = Cache(maxsize=1, policy='tinylfu')
+    cache.set('a', 1)
+    assert cache.set('a', 2)
+    assert cache.get('a') == 2
+
+
+def test_negative_cache():
+    unknown = NegativeCache(ttl=0.05)
+    unknown.add('x')
+    assert 'x' in unknown
+    assert 'y' not in unknown
+    time.sleep(0.1)
+    assert 'x' not in unknown
+
+
+def test_get_or_compute():
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return None if key == 'none' else key.upper()
+
+    async def compute_async(key):
+        calls.append(key)
+        return key.upper()
+
+    async def main():
+        cache = Cache()
+        assert await cache.get_or_compute('a', compute, 'a') == 'A'
+        assert await cache.get_or_compute('a', compute, 'a') == 'A'
+        assert await cache.get_or_compute('b', compute_async, 'b') == 'B'
+        assert await cache.get_or_compute('b', compute_async, 'b') == 'B'
+        # None is not cached
+        assert await cache.get_or_compute('none', compute, 'none') is None
+        assert await cache.get_or_compute('none', compute, 'none') is None
+
+    asyncio.run(main())
+    assert calls == ['a', 'b', 'none', 'none']
+
+
+def test_disk_spill(tmp_path):
+    disk = DiskCache(str(tmp_path / 'spill.db'))
+    cache = Cache(maxsize=1, disk=disk)
+    cache.set(('a', 1), {'forms': ['x']})
+    cache.set(('b', 2), {'forms': ['y']})
+    assert ('a', 1) not in cache
+    assert len(disk) == 1
+    # read back from the disk on a miss
+    assert cache.get(('a', 1)) == {'forms': ['x']}
+    assert ('a', 1) in cache
+    assert cache.stats['disk_hits'] == 1
+    assert cache.get(('c', 3)) is None
+    assert cache.stats['misses'] == 1
+
+
+def test_disk_spill_unserializable(tmp_path):
+    disk = DiskCache(str(tmp_path / 'spill.db'))
+    cache = Cache(maxsize=1, disk=disk)
+    cache.set('a', object())
+    cache.set('b', 'b')
+    assert len(disk) == 0
+    assert cache.stats['spill_errors'] == 1
+
+
+def test_budget_eviction_spilled(tmp_path):
+    budget = MemoryBudget(10)
+    disk = DiskCache(str(tmp_path / 'spill.db'))
+    first = Cache('first', budget=budget, disk=disk, sizeof=len)
+    second = Cache('second', budget=budget, sizeof=len)
+    first.set('a', 'xxxx')
+    second.set('b', 'xxxxxxxx')
+    assert 'a' not in first
+    assert first.get('a') == 'xxxx'
@@ -0,0 +1,78 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from utils.components import Components, ComponentError
+
+
+def test_dependencies_loaded_first():
+    order = []
+    components = Components()
+    components.add('index', lambda: order.append('index') or 'index',
+                   depends=['data'])
+    components.add('data', lambda: time.sleep(0.05) or order.append('data'))
+    components.start()
+    assert components.get('index', timeout=5) == 'index'
+    assert order == ['data', 'index']
+
+
+def test_load_in_calling_thread():
+    threads = {}
+    components = Components()
+    components.add('data', lambda: threads.setdefault(
+        'data', threading.current_thread()
+    ))
+    components.add('other', lambda: threads.setdefault(
+        'other', threading.current_thread()
+    ))
+    components.load('data')
+    assert threads == {'data': threading.current_thread()}
+    components.start()
+    components.get('other', timeout=5)
+    assert threads['other'] is not threading.current_thread()
+
+
+def test_failure():
+    def fail():
+        raise ValueError('unavailable')
+
+    components = Components()
+    components.add('platform', fail)
+    components.add('client', lambda: 'client', depends=['platform'])
+    components.start()
+    with pytest.raises(ComponentError, match='failed'):
+        components.get('client', timeout=5)
+    assert not components.is_ready('platform')
+    assert 'failed' in components.report()
+
+
+def test_get_timeout():
+    release = threading.Event()
+    components = Components()
+    components.add('slow', release.wait)
+    components.start()
+    with pytest.raises(ComponentError, match='not loaded yet'):
+        components.get('slow', timeout=0.01)
+    release.set()
+    assert components.get('slow', timeout=5)
+
+
+def test_wait():
+    release = threading.Event()
+    components = Components()
+    components.add('slow', lambda: release.wait() and 'slow')
+
+    async def main():
+        components.start()
+        waiting = asyncio.ensure_future(components.wait('slow'))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        release.set()
+        await asyncio.wait_for(waiting, 5)
+        # already loaded
+        await components.wait('slow')
+
+    asyncio.run(main())
+    assert components.get('slow') == 'slow'
@@ -0,0 +1,89 @@
+import time
+import asyncio
+
+import pytest
+
+from utils.deadline import (
+    DeadlineExceeded, RequestContext, request_context, current, check, within
+)
+
+
+def test_check():
+    context = RequestContext(0.05, 'test')
+    context.check('lookup')
+    time.sleep(0.06)
+    assert context.expired
+    with pytest.raises(DeadlineExceeded, match='before formatting'):
+        context.check('formatting')
+
+
+def test_request_context():
+    assert current() is None
+    check('lookup')
+    with request_context(10, 'outer') as outer:
+        assert current() is outer
+        with request_context(0, 'inner'):
+            with pytest.raises(DeadlineExceeded):
+                check('lookup')
+        assert current() is outer
+    assert current() is None
+
+
+def test_within_expiry():
+    async def main():
+        with request_context(0.05, 'test'):
+            await within(asyncio.sleep(1), 'heritage')
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match='in heritage'):
+        asyncio.run(main())
+    assert time.monotonic() - start < 0.5
+
+
+def test_within_expired_closes_coroutine():
+    async def stage():
+        pass
+
+    async def main():
+        coroutine = stage()
+        with request_context(0, 'test'):
+            with pytest.raises(DeadlineExceeded, match='before lookup'):
+                await within(coroutine, 'lookup')
+        # closed, not left to warn that it was never awaited
+        assert coroutine.cr_frame is None
+
+    asyncio.run(main())
+
+
+def test_stage_timeout_is_not_deadline():
+    async def main():
+        with request_context(10, 'test'):
+            await within(asyncio.wait_for(asyncio.sleep(1), 0.01), 'splitter')
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
+
+
+def test_within_without_context():
+    async def main():
+        return await within(asyncio.sleep(0, 'done'), 'lookup')
+
+    assert asyncio.run(main()) == 'done'
+
+
+def test_partial_results():
+    """Stages finished before the deadline are kept"""
+    async def main():
+        results = []
+        with request_context(0.15, 'test'):
+            for delay in [0.01, 0.01, 1, 0.01]:
+                try:
+                    results.append(
+                        await within(asyncio.sleep(delay, delay), 'chunk')
+                    )
+                except DeadlineExceeded:
+                    results.append('partial')
+                    break
+        return results
+
+    assert asyncio.run(main()) == [0.01, 0.01, 'partial']
@@ -0,0 +1,55 @@
+import time
+
+import requests
+from heritage import HeritagePlatform, HeritageOutput
+
+from tests.heritage_server import HeritageServer
+
+
+def get_declension_page(platform, word, gender):
+    options = {
+        'lex': platform.get_lexicon(),
+        't': platform.get_option('t'),
+        'q': platform.prepare_input(word),
+        'g': platform.identify_gender(gender),
+        'font': platform.get_font()
+    }
+    url = platform.get_url('declension')
+    return platform.get_result_from_web(url, options)
+
+
+def test_recorded_declensions():
+    with HeritageServer() as server:
+        platform = HeritagePlatform('', method='web', base_url=server.base_url)
+        html = get_declension_page(platform, 'राम', 'पुंलिङ्गम्')
+        rupaani = HeritageOutput(html).extract_declensions()
+    assert rupaani[1][1] == ['रामः']
+    assert rupaani[-1][0] == ['Voc.']
+    assert server.stats['served'] == 1
+
+
+def test_missing_recording():
+    with HeritageServer() as server:
+        response = requests.get(f'{server.base_url}sktdeclin.cgi?q=xyz')
+    assert response.status_code == 404
+
+
+def test_fallback_recording():
+    with HeritageServer(fallback=True) as server:
+        response = requests.get(f'{server.base_url}sktdeclin.cgi?q=xyz')
+    assert response.status_code == 200
+
+
+def test_error_rate():
+    with HeritageServer(error_rate=1.0) as server:
+        response = requests.get(f'{server.base_url}sktdeclin.cgi?q=raama')
+    assert response.status_code == 503
+    assert server.stats['error'] == 1
+
+
+def test_latency():
+    with HeritageServer(latency=0.2, jitter=0.1, seed=0) as server:
+        start = time.perf_counter()
+        requests.get(f'{server.base_url}sktdeclin.cgi?q=raama')
+        elapsed = time.perf_counter() - start
+    assert 0.2 <= elapsed < 1.0
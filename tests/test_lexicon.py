@@ -0,0 +1,24 @@
+from utils.lexicon import build_form_index
+
+
+class Terms:
+    def __init__(self, terms):
+        """DhatuPatha or ShabdaPatha with only `get_terms`"""
+        self.terms = set(terms)
+
+    def get_terms(self):
+        return self.terms
+
+
+def test_form_index():
+    form_index = build_form_index(
+        Terms(['भू', 'भवति', 'गम्']),
+        Terms(['राम', 'रामः', 'भवति']),
+        'dhatu', 'shabda'
+    )
+    assert form_index['भू'] == ('dhatu',)
+    assert form_index['रामः'] == ('shabda',)
+    # a form of a dhatu and of a word
+    assert form_index['भवति'] == ('dhatu', 'shabda')
+    assert 'xyz' not in form_index
+    assert len(form_index) == 5
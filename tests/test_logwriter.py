@@ -0,0 +1,57 @@
+import json
+import asyncio
+
+from utils.logwriter import LogWriter
+
+
+def write(writer, records):
+    async def main():
+        for record in records:
+            writer.write(record)
+        await writer.close()
+
+    asyncio.run(main())
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_appended(tmp_path):
+    path = str(tmp_path / 'logs' / 'suggestions.jsonl')
+    write(LogWriter(path), [{'text': 'धातु'}, {'text': 'शब्द'}])
+    write(LogWriter(path), [{'text': 'रूप'}])
+    assert read(path) == [
+        {'text': 'धातु'}, {'text': 'शब्द'}, {'text': 'रूप'}
+    ]
+
+
+def test_batches(tmp_path):
+    path = str(tmp_path / 'suggestions.jsonl')
+    writer = LogWriter(path, batch_size=2)
+    batches = []
+    _write = writer._write
+
+    def record_batch(records, sync=False):
+        batches.append(len(records))
+        _write(records, sync)
+
+    writer._write = record_batch
+    write(writer, [{'idx': idx} for idx in range(5)])
+    assert read(path) == [{'idx': idx} for idx in range(5)]
+    assert writer.written == 5
+    assert max(batches) == 2
+
+
+def test_write_error(tmp_path):
+    # a directory cannot be opened as the log file
+    writer = LogWriter(str(tmp_path))
+    write(writer, [{'text': 'lost'}])
+    assert writer.written == 0
+
+
+def test_close_without_records(tmp_path):
+    path = tmp_path / 'suggestions.jsonl'
+    asyncio.run(LogWriter(str(path)).close())
+    assert not path.exists()
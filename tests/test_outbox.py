@@ -0,0 +1,93 @@
+import time
+import asyncio
+
+from telethon.errors import FloodWaitError
+
+from utils.outbox import Outbox
+
+
+class FakeClient:
+    def __init__(self, flood_waits=0):
+        """Records the sent messages, failing the first `flood_waits`"""
+        self.flood_waits = flood_waits
+        self.sent = []
+
+    async def send_message(self, entity, text, **kwargs):
+        if self.flood_waits:
+            self.flood_waits -= 1
+            raise FloodWaitError(request=None, capture=0)
+        self.sent.append((entity, text, time.monotonic()))
+        return len(self.sent)
+
+
+def run(client, messages, **kwargs):
+    async def main():
+        outbox = Outbox(client, **kwargs)
+        futures = [
+            outbox.send(chat_id, text, **options)
+            for chat_id, text, options in messages
+        ]
+        results = await asyncio.gather(*futures)
+        await outbox.close()
+        return outbox, results
+
+    return asyncio.run(main())
+
+
+def test_combine():
+    client = FakeClient()
+    outbox, results = run(client, [
+        (1, 'a', {}),
+        (1, 'b', {}),
+        (1, 'c', {'combine': False}),
+        (1, 'd', {}),
+    ])
+    assert [text for _, text, _ in client.sent] == ['a\n\nb', 'c', 'd']
+    # combined messages resolve to the same sent message
+    assert results == [1, 1, 2, 3]
+    assert outbox.stats['combined'] == 1
+
+
+def test_combine_max_length():
+    client = FakeClient()
+    run(client, [(1, 'x' * 6, {}), (1, 'y' * 6, {})], max_length=10)
+    assert len(client.sent) == 2
+
+
+def test_buttons_not_combined():
+    client = FakeClient()
+    run(client, [(1, 'a', {}), (1, 'b', {'buttons': []})])
+    assert len(client.sent) == 2
+
+
+def test_chat_rate_limit():
+    client = FakeClient()
+    messages = [(1, str(idx), {'combine': False}) for idx in range(3)]
+    run(client, messages, chat_rate=10, chat_burst=1)
+    times = [sent for _, _, sent in client.sent]
+    assert [text for _, text, _ in client.sent] == ['0', '1', '2']
+    assert times[2] - times[0] >= 0.15
+
+
+def test_global_rate_limit():
+    client = FakeClient()
+    messages = [(chat_id, 'a', {}) for chat_id in range(4)]
+    run(client, messages, global_rate=10, global_burst=1)
+    times = sorted(sent for _, _, sent in client.sent)
+    assert len(times) == 4
+    assert times[-1] - times[0] >= 0.25
+
+
+def test_flood_wait_retry():
+    client = FakeClient(flood_waits=2)
+    outbox, results = run(client, [(1, 'a', {})])
+    assert results == [1]
+    assert outbox.stats['flood_waits'] == 2
+
+
+def test_flood_wait_give_up():
+    client = FakeClient(flood_waits=5)
+    outbox, results = run(client, [(1, 'a', {})], max_retries=2)
+    assert results == [None]
+    assert client.sent == []
+    assert outbox.stats['failed'] == 1
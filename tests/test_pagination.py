@@ -0,0 +1,57 @@
+import asyncio
+
+from utils.pagination import Pagination, PageStore
+
+
+def make_pagination(**kwargs):
+    rendered = []
+
+    async def render(idx):
+        rendered.append(idx)
+        return f'header\n```page {idx}```'
+
+    return Pagination(render, 3, **kwargs), rendered
+
+
+def test_pages_rendered_once():
+    pagination, rendered = make_pagination()
+
+    async def main():
+        assert await pagination.page(1) == 'header\n```page 1```'
+        await pagination.page(1)
+        await pagination.page(0)
+
+    asyncio.run(main())
+    assert rendered == [1, 0]
+
+
+def test_as_document():
+    pagination, _ = make_pagination(document='pages.txt')
+    document = asyncio.run(pagination.as_document())
+    assert document.name == 'pages.txt'
+    assert document.getvalue().decode('utf-8') == '\n\n'.join(
+        f'header\npage {idx}' for idx in range(3)
+    )
+
+
+def test_render_document():
+    async def render_document():
+        return 'header\n```page 0``````page 1``````page 2```'
+
+    pagination, rendered = make_pagination(
+        document='pages.txt', render_document=render_document
+    )
+    document = asyncio.run(pagination.as_document())
+    content = document.getvalue().decode('utf-8')
+    assert content == 'header\npage 0page 1page 2'
+    assert content.count('header') == 1
+    assert rendered == []
+
+
+def test_page_store():
+    store = PageStore(maxsize=2)
+    handles = [store.add(make_pagination()[0]) for _ in range(3)]
+    assert len(set(handles)) == 3
+    assert store.get(handles[0]) is None
+    assert store.get(handles[2]) is not None
+    assert store.get('unknown') is None
@@ -0,0 +1,46 @@
+from utils.preferences import PreferenceStore
+
+
+def test_set_get(tmp_path):
+    store = PreferenceStore(str(tmp_path / 'preferences.db')).start()
+    assert store.get(1, 'input') is None
+    assert store.get(1, 'input', 'devanagari') == 'devanagari'
+    store.set(1, 'input', 'hk')
+    assert store.get(1, 'input') == 'hk'
+    assert len(store) == 1
+    store.close()
+
+
+def test_persisted_on_close(tmp_path):
+    path = str(tmp_path / 'preferences.db')
+    store = PreferenceStore(path, sync_interval=60).start()
+    store.set(1, 'input', 'hk')
+    store.set(2, 'input', 'slp1')
+    store.close()
+
+    store = PreferenceStore(path).start()
+    assert store.get(1, 'input') == 'hk'
+    assert store.get(2, 'input') == 'slp1'
+    store.close()
+
+
+def test_shared_between_stores(tmp_path):
+    path = str(tmp_path / 'preferences.db')
+    first = PreferenceStore(path, sync_interval=60).start()
+    second = PreferenceStore(path, sync_interval=60).start()
+    first.set(1, 'input', 'hk')
+    first.sync()
+    second.sync()
+    assert second.get(1, 'input') == 'hk'
+
+    # local changes not written yet are kept
+    second.set(1, 'input', 'wx')
+    first.set(1, 'input', 'itrans')
+    first.sync()
+    second._pull()
+    assert second.get(1, 'input') == 'wx'
+    second.sync()
+    first.sync()
+    assert first.get(1, 'input') == 'wx'
+    first.close()
+    second.close()
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import threading
+
+from utils.cache import Cache
+from utils.prefetch import Prefetcher
+
+
+class Fetcher:
+    def __init__(self, delay=0.0):
+        """Records the fetched keys and the peak number of running fetches"""
+        self.delay = delay
+        self.fetched = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, root, gender):
+        with self._lock:
+            self.fetched.append((root, gender))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        return None if root == 'unknown' else f'{root}-{gender}'
+
+
+def test_prefetch_then_get():
+    fetch = Fetcher(delay=0.05)
+
+    async def main():
+        prefetcher = Prefetcher(fetch, Cache())
+        prefetcher.prefetch([('rama', 'm'), ('sita', 'f')])
+        # joins the pending prefetch
+        assert await prefetcher.get(('rama', 'm')) == 'rama-m'
+        await asyncio.sleep(0.1)
+        assert await prefetcher.get(('sita', 'f')) == 'sita-f'
+        # cached, not fetched again
+        prefetcher.prefetch([('rama', 'm')])
+        assert await prefetcher.get(('rama', 'm')) == 'rama-m'
+
+    asyncio.run(main())
+    assert sorted(fetch.fetched) == [('rama', 'm'), ('sita', 'f')]
+
+
+def test_prefetch_concurrency():
+    fetch = Fetcher(delay=0.02)
+
+    async def main():
+        prefetcher = Prefetcher(fetch, Cache(), concurrency=2)
+        prefetcher.prefetch([(str(idx), 'm') for idx in range(6)])
+        while prefetcher._pending:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert len(fetch.fetched) == 6
+    assert fetch.peak <= 2
+
+
+def test_none_not_cached():
+    fetch = Fetcher()
+
+    async def main():
+        prefetcher = Prefetcher(fetch, Cache())
+        assert await prefetcher.get(('unknown', 'm')) is None
+        assert await prefetcher.get(('unknown', 'm')) is None
+
+    asyncio.run(main())
+    assert len(fetch.fetched) == 2
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import shutil
+import asyncio
+import importlib.util
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DHATU_FILE = os.path.join(ROOT, 'tests', 'data', 'dhatu.json')
+
+
+@pytest.fixture(scope='module')
+def bot(tmp_path_factory):
+    """The bot module, configured with the sample configuration"""
+    tmp_path = tmp_path_factory.mktemp('bot')
+    spec = importlib.util.spec_from_file_location(
+        'config', os.path.join(ROOT, 'config.sample.py')
+    )
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    config.DHATU_FILE = str(tmp_path / 'dhatu.json')
+    config.SUGGESTION_DIR = str(tmp_path / 'suggestions')
+    config.PREFERENCES_FILE = str(tmp_path / 'preferences.sqlite3')
+    config.LEXICON_TIMEOUT = 0.5
+    config.TelegramConfig.api_id = 1
+    config.TelegramConfig.api_hash = 'hash'
+    config.TelegramConfig.bot_user = str(tmp_path / 'bot')
+    shutil.copy(DHATU_FILE, config.DHATU_FILE)
+
+    sys.modules['config'] = config
+    import bot
+    bot.COMPONENTS.load('form_index', 'lexicon', 'tabulate')
+    yield bot
+    del sys.modules['config']
+
+
+def update_meaning(bot, meaning):
+    with open(bot.config.DHATU_FILE, encoding='utf-8') as f:
+        data = json.load(f)
+    data['01.0001']['artha_english'] = meaning
+    with open(bot.config.DHATU_FILE, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def meaning(results):
+    return results[0]['dhatu']['artha_english']
+
+
+def test_reload_unchanged(bot):
+    version = bot.data_version()
+    assert asyncio.run(bot.request_reload()) is False
+    assert bot.data_version() == version
+
+
+def test_reload(bot):
+    version = bot.data_version()
+    bot.RESPONSES.set(('cached',), ['response'])
+    update_meaning(bot, 'become')
+
+    async def main():
+        # concurrent requests share a single reload
+        return await asyncio.gather(bot.request_reload(), bot.request_reload())
+
+    assert asyncio.run(main()) == [True, True]
+    assert bot.data_version() != version
+    assert len(bot.RESPONSES) == 0
+    assert 'भवति' in bot.FORM_INDEX
+    assert meaning(bot.lookup('search_dhatu', 'भू')) == 'become'
+
+
+def test_prewarm_failure_logged(bot, monkeypatch, caplog):
+    def prewarm_responses():
+        raise ValueError('prewarm')
+
+    monkeypatch.setattr(bot, 'prewarm_responses', prewarm_responses)
+    update_meaning(bot, 'arise')
+
+    async def main():
+        assert await bot.request_reload() is True
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert 'Background job failed.' in caplog.text
+    assert 'ValueError: prewarm' in caplog.text
+
+
+def test_reload_forks_workers(bot):
+    bot.config.LEXICON_WORKERS = 2
+    bot.LEXICON_POOL = bot.prefork(bot.LEXICON, 2, timeout=5)
+    old_pool = bot.LEXICON_POOL
+    update_meaning(bot, 'exist')
+
+    async def main():
+        assert await bot.request_reload() is True
+        assert bot.LEXICON_POOL is not old_pool
+        # workers forked from the new data
+        results = await asyncio.gather(*[
+            asyncio.wrap_future(future)
+            for future in bot.LEXICON_POOL.broadcast('search_dhatu', 'भू')
+        ])
+        assert [meaning(result) for result in results] == ['exist'] * 2
+        assert meaning(await bot.async_lookup('search_dhatu', 'भू')) == (
+            'exist'
+        )
+        # the old pool is closed once its calls have timed out
+        await asyncio.sleep(bot.config.LEXICON_TIMEOUT + 1)
+        assert not any(
+            worker.process.is_alive() for worker in old_pool.workers
+        )
+
+    try:
+        asyncio.run(main())
+    finally:
+        bot.LEXICON_POOL.close()
+        bot.LEXICON_POOL = None
+        bot.config.LEXICON_WORKERS = 0
@@ -0,0 +1,43 @@
+from utils.router import CommandTrie
+
+
+def make_routes():
+    routes = CommandTrie()
+    routes.add('/dhatu', 'dhatu')
+    routes.add('/dhatupatha', 'dhatupatha')
+    routes.add('/dr_', 'dhatu_rupa', prefix=True)
+    routes.add('धातु', 'dhatu')
+    return routes
+
+
+def test_exact_command():
+    routes = make_routes()
+    assert routes.match('/dhatu') == ('dhatu', 6)
+    assert routes.match('/dhatu 01.0001') == ('dhatu', 6)
+    assert routes.match('/dhatupatha') == ('dhatupatha', 11)
+    # not followed by whitespace
+    assert routes.match('/dhatux') is None
+    assert routes.match('/dhat') is None
+
+
+def test_prefix_command():
+    routes = make_routes()
+    assert routes.match('/dr_01_0001') == ('dhatu_rupa', 4)
+    assert routes.match('/dr_') == ('dhatu_rupa', 4)
+    assert routes.match('/d') is None
+
+
+def test_alias():
+    routes = make_routes()
+    assert routes.match('धातु भू') == ('dhatu', 4)
+    assert routes.match('धातुः') is None
+    assert routes.match('text') is None
+    assert routes.match('') is None
+
+
+def test_size():
+    routes = make_routes()
+    assert len(routes) == 4
+    routes.add('/dhatu', 'other')
+    assert len(routes) == 4
+    assert routes.match('/dhatu') == ('other', 6)
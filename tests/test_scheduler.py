@@ -0,0 +1,120 @@
+import time
+import asyncio
+
+import pytest
+
+from utils.scheduler import (
+    TokenBucket, LazySemaphore, Lane, Scheduler, Overloaded, RateLimited
+)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.consume()
+    assert bucket.consume()
+    assert not bucket.consume()
+    assert 0 < bucket.wait_time() <= 0.05
+    time.sleep(0.06)
+    assert bucket.consume()
+
+
+def test_user_quota():
+    async def handler():
+        return 'ok'
+
+    async def main():
+        lane = Lane('fast', 4, 4, user_rate=0.1, user_burst=2)
+        assert await lane.run(1, handler) == 'ok'
+        assert await lane.run(1, handler) == 'ok'
+        with pytest.raises(RateLimited):
+            await lane.run(1, handler)
+        # other users have their own quota
+        assert await lane.run(2, handler) == 'ok'
+        return lane
+
+    lane = asyncio.run(main())
+    assert lane.stats['rate_limited'] == 1
+    assert lane.stats['admitted'] == 3
+
+
+def test_load_shedding():
+    async def main():
+        lane = Lane('slow', 1, 1, user_rate=100, user_burst=100)
+        release = asyncio.Event()
+
+        async def handler():
+            await release.wait()
+
+        running = asyncio.ensure_future(lane.run(1, handler))
+        waiting = asyncio.ensure_future(lane.run(2, handler))
+        await asyncio.sleep(0)
+        assert (lane.running, lane.waiting) == (1, 1)
+        with pytest.raises(Overloaded):
+            await lane.run(3, handler)
+        release.set()
+        await asyncio.gather(running, waiting)
+        return lane
+
+    lane = asyncio.run(main())
+    assert lane.stats['shed'] == 1
+    assert (lane.running, lane.waiting) == (0, 0)
+
+
+def test_shed_request_keeps_quota():
+    async def main():
+        lane = Lane('slow', 1, 0, user_rate=0.1, user_burst=1)
+        release = asyncio.Event()
+
+        async def handler():
+            await release.wait()
+
+        running = asyncio.ensure_future(lane.run(1, handler))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await lane.run(2, handler)
+        release.set()
+        await running
+        # user 2 was not admitted, their token is still there
+        assert await lane.run(2, handler) is None
+        return lane
+
+    lane = asyncio.run(main())
+    assert lane.stats['rate_limited'] == 0
+
+
+def test_lazy_semaphore():
+    semaphore = LazySemaphore(1)
+
+    async def main():
+        async with semaphore:
+            assert semaphore.get().locked()
+        assert not semaphore.get().locked()
+
+    assert semaphore._semaphore is None
+    asyncio.run(main())
+
+
+def test_lanes_are_independent():
+    async def main():
+        scheduler = Scheduler([
+            Lane('fast', 2, 2, user_rate=100, user_burst=100),
+            Lane('slow', 1, 0, user_rate=100, user_burst=100),
+        ])
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+
+        async def fast():
+            return 'fast'
+
+        blocked = asyncio.ensure_future(scheduler.run('slow', 1, slow))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await scheduler.run('slow', 2, slow)
+        # the fast lane is not held up by the full slow lane
+        assert await scheduler.run('fast', 2, fast) == 'fast'
+        release.set()
+        await blocked
+
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_coalesced():
+    calls = []
+
+    async def lookup(word):
+        calls.append(word)
+        await asyncio.sleep(0.05)
+        return word.upper()
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            *[flight.run('a', lookup, 'a') for _ in range(5)],
+            flight.run('b', lookup, 'b')
+        )
+        assert len(flight) == 0
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ['A'] * 5 + ['B']
+    assert sorted(calls) == ['a', 'b']
+    assert flight.stats == {'calls': 2, 'coalesced': 4}
+
+
+def test_blocking_function():
+    release = threading.Event()
+
+    def lookup(word):
+        release.wait(5)
+        return word.upper()
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.run('a', lookup, 'a'))
+        second = asyncio.ensure_future(flight.run('a', lookup, 'a'))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await asyncio.gather(first, second), flight.stats
+
+    results, stats = asyncio.run(main())
+    assert results == ['A', 'A']
+    assert stats['calls'] == 1
+
+
+def test_cancelled_caller():
+    async def lookup():
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def main():
+        flight = SingleFlight()
+        impatient = asyncio.ensure_future(flight.run('a', lookup))
+        patient = asyncio.ensure_future(flight.run('a', lookup))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == 'done'
+
+
+def test_failure_not_kept():
+    attempts = []
+
+    async def lookup():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError('unavailable')
+        return 'done'
+
+    async def main():
+        flight = SingleFlight()
+        with pytest.raises(ValueError):
+            await flight.run('a', lookup)
+        return await flight.run('a', lookup)
+
+    assert asyncio.run(main()) == 'done'
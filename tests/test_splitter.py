@@ -0,0 +1,143 @@
+import os
+import json
+
+import pytest
+
+from utils.batching import BatchScheduler
+from utils.splitter import Splitter, SplitCache
+
+
+class StubLoader:
+    def __init__(self, fail=None):
+        """Encodes characters as code points, decodes them upper-cased
+
+        Records the encoded lines, failing on the line `fail`
+        """
+        self.fail = fail
+        self.encoded = []
+
+    def encode_line(self, line):
+        if line == self.fail:
+            raise ValueError(line)
+        self.encoded.append(line)
+        return [ord(char) for char in line], [1] * len(line)
+
+    def decode_line(self, line, predictions):
+        return ''.join(chr(symbol) for symbol in predictions).upper()
+
+
+class StubSession:
+    def __init__(self):
+        """Records the feeds, predicting the input symbols"""
+        self.feeds = []
+
+    def run(self, fetches, feed_dict):
+        self.feeds.append(feed_dict)
+        return feed_dict['inputs']
+
+
+def make_splitter(batch_size=64, bucket_width=32, fail=None):
+    """Splitter around a stub session, without loading a model"""
+    splitter = Splitter.__new__(Splitter)
+    splitter.cache = SplitCache()
+    splitter.logger = splitter.cache.logger
+    splitter.sandhi_data = StubLoader(fail)
+    splitter.sess = StubSession()
+    splitter.use_files = False
+    splitter.predictions_ph = 'predictions'
+    splitter.x_ph = 'inputs'
+    splitter.split_cnts_ph = 'split_cnts'
+    splitter.seqlen_ph = 'seqlens'
+    splitter.dropout_ph = 'dropout_keep_prob'
+    splitter.batcher = None
+    if batch_size > 1:
+        splitter.batcher = BatchScheduler(
+            splitter._split_lines,
+            max_batch_size=batch_size,
+            bucket_width=bucket_width
+        )
+    return splitter
+
+
+def test_one_run_per_bucket():
+    splitter = make_splitter(bucket_width=4)
+    lines = ['ab', 'abcdefg', 'abc', 'abcde']
+    output = splitter.split('\n'.join(lines), input_scheme='iast')
+    assert output.split('\n') == [line.upper() for line in lines]
+
+    feeds = splitter.sess.feeds
+    assert len(feeds) == 2
+    # padded to the longest line of the bucket
+    assert feeds[0]['seqlens'] == [2, 3]
+    assert [len(x) for x in feeds[0]['inputs']] == [3, 3]
+    assert feeds[1]['seqlens'] == [5, 7]
+    assert [len(x) for x in feeds[1]['split_cnts']] == [7, 7]
+    assert all(feed['dropout_keep_prob'] == 1.0 for feed in feeds)
+    splitter.batcher.close()
+
+
+def test_cached_lines_not_run():
+    splitter = make_splitter()
+    splitter.split('ab\ncd', input_scheme='iast')
+    assert splitter.split('cd\n\nab', input_scheme='iast') == 'CD\n\nAB'
+    assert len(splitter.sess.feeds) == 1
+    splitter.batcher.close()
+
+
+def test_split_cache(tmp_path):
+    path = str(tmp_path / 'splits.db')
+    cache = SplitCache(path)
+    assert cache.get('a') is None
+    cache.set('a', 'A')
+    assert cache.get('a') == 'A'
+    # a new process only has the on-disk cache
+    cache = SplitCache(path)
+    assert cache.get('a') == 'A'
+    assert cache.get('a') == 'A'
+    assert (cache.stats['disk_hits'], cache.stats['memory_hits']) == (1, 1)
+    assert cache.hit_rate() == 1.0
+    assert '2 lookups' in cache.report()
+
+
+def test_split_file_order(tmp_path):
+    lines = [f'line {idx}' + 'x' * (idx % 7) for idx in range(50)]
+    path_in = tmp_path / 'input.txt'
+    path_out = tmp_path / 'output.txt'
+    path_in.write_text('\n'.join(lines + ['']), encoding='utf-8')
+
+    splitter = make_splitter(bucket_width=1)
+    splitter.split_file(
+        str(path_in), str(path_out), input_scheme='iast',
+        chunk_size=3, workers=4
+    )
+    output = path_out.read_text(encoding='utf-8').split('\n')
+    assert output == [line.upper() for line in lines] + ['']
+    assert not os.path.exists(f'{path_out}.checkpoint')
+    splitter.batcher.close()
+
+
+def test_split_file_resume(tmp_path):
+    lines = [f'line {idx}' for idx in range(10)]
+    path_in = tmp_path / 'input.txt'
+    path_out = tmp_path / 'output.txt'
+    path_in.write_text('\n'.join(lines), encoding='utf-8')
+
+    splitter = make_splitter(batch_size=1, fail='line 7')
+    with pytest.raises(ValueError):
+        splitter.split_file(
+            str(path_in), str(path_out), input_scheme='iast',
+            chunk_size=2, workers=1
+        )
+    with open(f'{path_out}.checkpoint', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert checkpoint['lines'] == 6
+
+    splitter = make_splitter(batch_size=1)
+    splitter.split_file(
+        str(path_in), str(path_out), input_scheme='iast',
+        chunk_size=2, workers=1
+    )
+    output = path_out.read_text(encoding='utf-8').split('\n')
+    assert output == [line.upper() for line in lines] + ['']
+    # lines before the checkpoint are not split again
+    assert splitter.sandhi_data.encoded == lines[6:]
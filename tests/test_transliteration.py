@@ -0,0 +1,44 @@
+import string
+
+from indic_transliteration import sanscript
+
+from utils.transliteration import Transliterator, PASSTHROUGH_PATTERN
+
+SCHEMES = ['devanagari', 'hk', 'velthuis', 'itrans', 'slp1', 'wx', 'iast']
+
+
+def test_same_as_sanscript():
+    transliterator = Transliterator()
+    for text in ['rAmaH', 'kRSNa', 'a|b', 'rAma||']:
+        for scheme in SCHEMES:
+            expected = sanscript.transliterate(text, 'hk', scheme)
+            assert transliterator.transliterate(text, 'hk', scheme) == \
+                expected
+
+
+def test_passthrough_is_identity():
+    for char in string.digits + string.punctuation + string.whitespace:
+        if not PASSTHROUGH_PATTERN.match(char):
+            continue
+        for from_scheme in SCHEMES:
+            for to_scheme in SCHEMES:
+                assert sanscript.transliterate(
+                    char, from_scheme, to_scheme
+                ) == char
+
+
+def test_danda_not_passed_through():
+    transliterator = Transliterator()
+    assert not PASSTHROUGH_PATTERN.match('|')
+    assert transliterator.transliterate('||', 'hk', 'devanagari') == '॥'
+    assert transliterator.transliterate('1', 'hk', 'devanagari') == '१'
+    assert transliterator.transliterate('(?)', 'hk', 'devanagari') == '(?)'
+
+
+def test_memo():
+    transliterator = Transliterator(memo_max_length=8)
+    transliterator.transliterate('rAma', 'hk', 'devanagari')
+    transliterator.transliterate('rAma', 'hk', 'devanagari')
+    transliterator.transliterate('rAmaH kRSNaH', 'hk', 'devanagari')
+    assert len(transliterator.memo) == 1
+    assert transliterator.memo.stats['hits'] == 1
@@ -0,0 +1,101 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from utils.workers import WorkerPool, WorkerError
+
+
+class Echo:
+    """Hosted object for the tests"""
+    def echo(self, value):
+        return value
+
+    def pid(self):
+        return os.getpid()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def fail(self):
+        raise ValueError('failed')
+
+    def crash(self):
+        os._exit(1)
+
+
+def wait_ready(pool, count, timeout=30):
+    start = time.monotonic()
+    while pool.ready < count:
+        assert time.monotonic() - start < timeout, 'workers not ready'
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(
+        'tests.test_workers.Echo', replicas=2, timeout=0.5,
+        restart_backoff=0.1
+    ).start()
+    wait_ready(pool, 2)
+    yield pool
+    pool.close()
+
+
+def test_submit(pool):
+    assert pool.submit('echo', 'x').result(timeout=5) == 'x'
+    with pytest.raises(WorkerError, match='ValueError: failed'):
+        pool.submit('fail').result(timeout=5)
+
+
+def test_timeout(pool):
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pool.run('sleep', 5))
+    # the other worker is free to serve calls
+    assert asyncio.run(pool.run('echo', 'x')) == 'x'
+
+
+def test_broadcast(pool):
+    futures = pool.broadcast('pid')
+    pids = {future.result(timeout=5) for future in futures}
+    assert pids == {worker.process.pid for worker in pool.workers}
+    assert len(pids) == 2
+
+
+def test_crash_restart(pool):
+    pids = {worker.process.pid for worker in pool.workers}
+    with pytest.raises(WorkerError, match='crashed'):
+        pool.submit('crash').result(timeout=10)
+    wait_ready(pool, 2)
+    assert {worker.process.pid for worker in pool.workers} != pids
+    assert pool.submit('echo', 'x').result(timeout=5) == 'x'
+
+
+def test_give_up():
+    pool = WorkerPool(
+        'tests.test_workers.Missing', max_restarts=1, restart_backoff=0.1
+    ).start()
+    start = time.monotonic()
+    while not pool.failed:
+        assert time.monotonic() - start < 30, 'pool not failed'
+        time.sleep(0.1)
+    with pytest.raises(WorkerError, match='All workers have failed'):
+        pool.submit('echo', 'x').result(timeout=5)
+    pool.close()
+
+
+def test_fork_pool_not_restarted():
+    pool = WorkerPool(
+        Echo, start_method='fork', restart_backoff=0.1
+    ).start()
+    wait_ready(pool, 1)
+    with pytest.raises(WorkerError, match='crashed'):
+        pool.submit('crash').result(timeout=10)
+    start = time.monotonic()
+    while not pool.failed:
+        assert time.monotonic() - start < 5, 'pool not failed'
+        time.sleep(0.05)
+    assert not pool.available
+    assert pool.ready == 0
+    pool.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dynamic Micro-Batching
+
+Requests that arrive within a short window are combined, bucketed by
+length and processed together, so that a model is run once per batch
+instead of once per request.
+"""
+
+###############################################################################
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+###############################################################################
+
+
+class BatchRequest:
+    def __init__(self, items):
+        self.items = items
+        self.results = [None] * len(items)
+        self.future = Future()
+
+
+class BatchScheduler:
+    def __init__(
+        self,
+        process,
+        max_batch_size=64,
+        max_wait=0.005,
+        bucket_width=32,
+        key=len
+    ):
+        """
+        Collect items from concurrent callers and process them in batches
+
+        Parameters
+        ----------
+        process : callable
+            Function that takes a list of items and returns the list of
+            corresponding outputs
+        max_batch_size : int, optional
+            Maximum number of items passed to `process` at once.
+            The default is 64.
+        max_wait : float, optional
+            Time (in seconds) to wait for more requests after the first one
+            of a batch has arrived. The default is 0.005.
+        bucket_width : int, optional
+            Items are sorted by `key` and those with the same
+            `key(item) // bucket_width` are processed together, to minimise
+            the padding in a batch. The default is 32.
+        key : callable, optional
+            Length of an item. The default is len.
+        """
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.bucket_width = bucket_width
+        self.key = key
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, items):
+        """
+        Submit items for processing
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the list of outputs corresponding to `items`
+        """
+        request = BatchRequest(list(items))
+        if not request.items:
+            request.future.set_result([])
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    # ----------------------------------------------------------------------- #
+
+    def _run(self):
+        closed = False
+        while not closed:
+            request = self._queue.get()
+            if request is None:
+                break
+
+            requests = [request]
+            size = len(request.items)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    closed = True
+                    break
+                requests.append(request)
+                size += len(request.items)
+
+            self._execute(requests)
+
+    def _buckets(self, requests):
+        entries = sorted(
+            (
+                (self.key(item), request, idx)
+                for request in requests
+                for idx, item in enumerate(request.items)
+            ),
+            key=lambda entry: entry[0]
+        )
+        bucket = []
+        bucket_id = None
+        for entry in entries:
+            _bucket_id = entry[0] // self.bucket_width
+            if bucket and (
+                _bucket_id != bucket_id or len(bucket) >= self.max_batch_size
+            ):
+                yield bucket
+                bucket = []
+            bucket_id = _bucket_id
+            bucket.append(entry)
+        if bucket:
+            yield bucket
+
+    def _execute(self, requests):
+        failed = {}
+        for bucket in self._buckets(requests):
+            pending = [
+                (request, idx) for _, request, idx in bucket
+                if id(request) not in failed
+            ]
+            if not pending:
+                continue
+            try:
+                outputs = self.process([
+                    request.items[idx] for request, idx in pending
+                ])
+            except Exception as e:
+                self.logger.exception("Batch failed.")
+                for request, _ in pending:
+                    failed[id(request)] = e
+                continue
+            for (request, idx), output in zip(pending, outputs):
+                request.results[idx] = output
+
+        for request in requests:
+            if id(request) in failed:
+                request.future.set_exception(failed[id(request)])
+            else:
+                request.future.set_result(request.results)
+
+###############################################################################
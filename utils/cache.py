@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caching Utilities
+
+Cache is the in-memory cache used throughout: a bounded LRU by default,
+optionally with TinyLFU admission, TTLs, a size budget (optionally shared
+with other caches through a MemoryBudget), spilling of evicted entries to
+a DiskCache, and statistics. NegativeCache remembers misses, DiskCache is a
+persistent string store.
+"""
+
+###############################################################################
+
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import itertools
+import threading
+from collections import Counter, OrderedDict
+
+###############################################################################
+
+MISSING = object()
+
+# logical clock of accesses, to compare recency across caches
+_clock = itertools.count()
+
+
+def estimate_size(value):
+    """Approximate memory size (in bytes) of a value of builtin types"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+###############################################################################
+
+
+class FrequencySketch:
+    def __init__(self, width=4096, depth=4, sample_size=None):
+        """
+        Count-Min sketch of access frequencies, as used by TinyLFU
+
+        Counts are halved after every `sample_size` additions, so that
+        the frequencies reflect recent popularity.
+
+        Parameters
+        ----------
+        width : int, optional
+            Number of counters per row.
+            The default is 4096.
+        depth : int, optional
+            Number of rows (hash functions).
+            The default is 4.
+        sample_size : int, optional
+            Number of additions after which the counts are halved.
+            The default is None (10 times the width).
+        """
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size or 10 * width
+        self.additions = 0
+        self.table = [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key):
+        return [hash((row, key)) % self.width for row in range(self.depth)]
+
+    def add(self, key):
+        for row, idx in zip(self.table, self._indexes(key)):
+            row[idx] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            for row in self.table:
+                for idx, count in enumerate(row):
+                    row[idx] = count >> 1
+            self.additions //= 2
+
+    def estimate(self, key):
+        return min(
+            row[idx] for row, idx in zip(self.table, self._indexes(key))
+        )
+
+###############################################################################
+
+
+class MemoryBudget:
+    def __init__(self, max_bytes):
+        """
+        Size budget shared by several caches
+
+        When the total size of their entries exceeds `max_bytes`, the least
+        recently used entries across all the caches are evicted.
+
+        Parameters
+        ----------
+        max_bytes : int
+            Size budget (in bytes)
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.caches = []
+        # one lock for all the caches, as eviction crosses caches
+        self.lock = threading.RLock()
+
+    def register(self, cache):
+        with self.lock:
+            self.caches.append(cache)
+
+    def reclaim(self):
+        """
+        Evict least recently used entries until within the budget
+
+        Returns
+        -------
+        list
+            (cache, (key, entry)) of the evicted entries
+        """
+        evicted = []
+        with self.lock:
+            while self.nbytes > self.max_bytes:
+                cache = self.victim()
+                if cache is None:
+                    break
+                evicted.append((cache, cache._evict_oldest()))
+        return evicted
+
+    def victim(self):
+        """Cache holding the least recently used entry"""
+        candidates = [cache for cache in self.caches if cache._data]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda cache: cache._oldest_access())
+
+    def report(self):
+        lines = [f"Cache memory: {self.nbytes}/{self.max_bytes} bytes"]
+        lines.extend(f"    {cache.report()}" for cache in self.caches)
+        return '\n'.join(lines)
+
+###############################################################################
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expiry', 'accessed')
+
+    def __init__(self, value, size, expiry):
+        self.value = value
+        self.size = size
+        self.expiry = expiry
+        self.accessed = next(_clock)
+
+
+class Cache:
+    def __init__(
+        self,
+        name='cache',
+        maxsize=1024,
+        max_bytes=None,
+        ttl=None,
+        policy='lru',
+        budget=None,
+        disk=None,
+        sizeof=estimate_size,
+        dumps=json.dumps,
+        loads=json.loads
+    ):
+        """
+        In-memory cache with pluggable admission, expiry and size limits
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the cache, used in reports.
+            The default is 'cache'.
+        maxsize : int, optional
+            Maximum number of entries (None for no limit).
+            The default is 1024.
+        max_bytes : int, optional
+            Maximum total size of the entries, as measured by `sizeof`.
+            The default is None (no limit).
+        ttl : float, optional
+            Time (in seconds) after which an entry expires.
+            The default is None (never).
+        policy : str, optional
+            Admission policy when the cache is full.
+            'lru' always admits a new entry and evicts the least recently
+            used ones, 'tinylfu' admits it only if it is requested more
+            frequently than the entry it would evict.
+            The default is 'lru'.
+        budget : MemoryBudget, optional
+            Size budget shared with other caches.
+            The default is None.
+        disk : DiskCache, optional
+            Entries evicted from memory are moved to `disk`, and read back
+            from it on a miss. Keys and values must be serializable with
+            `dumps`. The default is None.
+        sizeof : callable, optional
+            Size (in bytes) of a value, used only with `max_bytes` or
+            `budget`.
+            The default is estimate_size.
+        dumps : callable, optional
+            Serializer of keys and values for `disk`.
+            The default is json.dumps.
+        loads : callable, optional
+            Deserializer of values for `disk`.
+            The default is json.loads.
+        """
+        if policy not in ['lru', 'tinylfu']:
+            raise ValueError(f"Invalid cache policy: {policy}")
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+        self.budget = budget
+        self.disk = disk
+        self.sizeof = sizeof
+        self.dumps = dumps
+        self.loads = loads
+        self.sized = max_bytes is not None or budget is not None
+
+        self.nbytes = 0
+        self.stats = Counter()
+        self.sketch = FrequencySketch() if policy == 'tinylfu' else None
+
+        self._data = OrderedDict()
+        if budget is not None:
+            self._lock = budget.lock
+            budget.register(self)
+        else:
+            self._lock = threading.RLock()
+
+    # ----------------------------------------------------------------------- #
+
+    def get(self, key, default=None):
+        with self._lock:
+            if self.sketch is not None:
+                self.sketch.add(key)
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                self.stats['expirations'] += 1
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+                entry.accessed = next(_clock)
+                self.stats['hits'] += 1
+                return entry.value
+
+        if self.disk is not None:
+            value = self.disk.get(self.dumps(key))
+            if value is not None:
+                value = self.loads(value)
+                self.stats['disk_hits'] += 1
+                self.set(key, value)
+                return value
+
+        self.stats['misses'] += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Add an entry, subject to the admission policy
+
+        Returns
+        -------
+        bool
+            True if the entry was admitted
+        """
+        size = self.sizeof(value) if self.sized else 0
+        ttl = self.ttl if ttl is None else ttl
+        expiry = time.monotonic() + ttl if ttl is not None else None
+        evicted = []
+        with self._lock:
+            replaced = self._remove(key) is not None
+            if not replaced and not self._admit(key, size):
+                self.stats['rejections'] += 1
+                return False
+
+            self._data[key] = _Entry(value, size, expiry)
+            self._resize(size)
+            while self._over_limit() and len(self._data) > 1:
+                evicted.append((self, self._evict_oldest()))
+            if self.budget is not None:
+                evicted.extend(self.budget.reclaim())
+            admitted = key in self._data
+
+        # written to the disk outside the lock
+        for cache, (evicted_key, entry) in evicted:
+            cache._spill(evicted_key, entry)
+        return admitted
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._remove(key)
+        return default if entry is None else entry.value
+
+    def clear(self):
+        with self._lock:
+            self._resize(-self.nbytes)
+            self._data.clear()
+
+    async def get_or_compute(self, key, compute, *args, ttl=None):
+        """
+        Value for `key`, computed by `compute(*args)` on a miss
+
+        `compute` may be a coroutine function, otherwise it is run in the
+        default executor. A result of None is not cached.
+        """
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        if asyncio.iscoroutinefunction(compute):
+            value = await compute(*args)
+        else:
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(None, compute, *args)
+        if value is not None:
+            self.set(key, value, ttl=ttl)
+        return value
+
+    # ----------------------------------------------------------------------- #
+
+    def _expired(self, entry):
+        return entry.expiry is not None and entry.expiry < time.monotonic()
+
+    def _resize(self, delta):
+        self.nbytes += delta
+        if self.budget is not None:
+            self.budget.nbytes += delta
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._resize(-entry.size)
+        return entry
+
+    def _over_limit(self, extra_entries=0, extra_bytes=0):
+        return (
+            (self.maxsize is not None
+             and len(self._data) + extra_entries > self.maxsize)
+            or (self.max_bytes is not None
+                and self.nbytes + extra_bytes > self.max_bytes)
+        )
+
+    def _admit(self, key, size):
+        limits = [self.max_bytes]
+        if self.budget is not None:
+            limits.append(self.budget.max_bytes)
+        if any(limit is not None and size > limit for limit in limits):
+            return False
+        if self.sketch is None:
+            return True
+
+        if self._data and self._over_limit(1, size):
+            victim = next(iter(self._data))
+        elif (
+            self.budget is not None
+            and self.budget.nbytes + size > self.budget.max_bytes
+            and self.budget.victim() is not None
+        ):
+            victim = next(iter(self.budget.victim()._data))
+        else:
+            return True
+        return self.sketch.estimate(key) > self.sketch.estimate(victim)
+
+    def _oldest_access(self):
+        return next(iter(self._data.values())).accessed
+
+    def _evict_oldest(self):
+        key, entry = self._data.popitem(last=False)
+        self._resize(-entry.size)
+        self.stats['evictions'] += 1
+        return key, entry
+
+    def _spill(self, key, entry):
+        if self.disk is None or self._expired(entry):
+            return
+        try:
+            self.disk.set(self.dumps(key), self.dumps(entry.value))
+        except (TypeError, ValueError, sqlite3.Error):
+            self.stats['spill_errors'] += 1
+
+    # ----------------------------------------------------------------------- #
+
+    def report(self):
+        hits = self.stats['hits'] + self.stats['disk_hits']
+        lookups = hits + self.stats['misses']
+        hit_rate = hits / lookups if lookups else 0
+        counters = ', '.join(
+            f"{key}={value}" for key, value in sorted(self.stats.items())
+        )
+        return (
+            f"{self.name}: {len(self._data)} entries, {self.nbytes} bytes, "
+            f"hit rate {hit_rate:.1%} ({counters})"
+        )
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry)
+
+    def __len__(self):
+        return len(self._data)
+
+###############################################################################
+
+
+class NegativeCache:
+    """Remember confirmed misses for `ttl` seconds"""
+
+    def __init__(self, maxsize=4096, ttl=3600):
+        self.ttl = ttl
+        self._cache = Cache('negative', maxsize=maxsize, ttl=ttl)
+
+    def add(self, key):
+        self._cache.set(key, True)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __contains__(self, key):
+        return self._cache.get(key, False)
+
+    def __len__(self):
+        return len(self._cache)
+
+###############################################################################
+
+
+class DiskCache:
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        """
+        Persistent string cache in SQLite, bounded by size
+
+        The database is opened in WAL mode, so that it can be shared by
+        several processes. Least recently used entries are evicted once
+        the total size of keys and values exceeds `max_bytes`.
+
+        Parameters
+        ----------
+        path : str
+            Path to the SQLite database
+        max_bytes : int, optional
+            Size budget (in bytes).
+            The default is 64 MiB.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)"
+        )
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            self.conn.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?",
+                (time.time(), key)
+            )
+        return row[0]
+
+    def set(self, key, value):
+        size = len(key.encode('utf-8')) + len(value.encode('utf-8'))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+
+    def _evict(self):
+        """Evict least recently used entries down to 90% of the budget"""
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(0.9 * self.max_bytes)
+        evicted = []
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM cache ORDER BY accessed"
+        ):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __len__(self):
+        with self._lock:
+            row = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        return row[0]
+
+###############################################################################
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Component Initialization
+
+Independent components (data indexes, external platforms) are loaded
+concurrently in background threads, so that the bot can connect and serve
+whatever is ready while the rest is still loading.
+"""
+
+###############################################################################
+
+import time
+import asyncio
+import logging
+import threading
+
+###############################################################################
+
+
+class ComponentError(Exception):
+    pass
+
+###############################################################################
+
+
+def wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+###############################################################################
+
+
+class Components:
+    def __init__(self):
+        """
+        Registry of components, each loaded once by its factory
+
+        Components are added with `add`, loaded with `start` (or `load`,
+        for those needed before any thread is started), and obtained with
+        `get` (blocking) or `wait` (awaitable).
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.factories = {}
+        self.values = {}
+        self.errors = {}
+        self.timings = {}
+
+        self._events = {}
+        # futures of the coroutines waiting for a component, by name
+        self._waiters = {}
+        self._lock = threading.Lock()
+        self._started = None
+
+    def add(self, name, factory, depends=()):
+        """
+        Register a component
+
+        Parameters
+        ----------
+        name : str
+            Name of the component.
+        factory : callable
+            Function (without arguments) that returns the component.
+        depends : iterable, optional
+            Names of the components that must be loaded first.
+            The default is ().
+        """
+        self.factories[name] = (factory, tuple(depends))
+        self._events[name] = threading.Event()
+        self._waiters[name] = []
+
+    def load(self, *names):
+        """Load components (and their dependencies) in the calling thread"""
+        if self._started is None:
+            self._started = time.perf_counter()
+        for name in names:
+            if not self._events[name].is_set():
+                self.load(*self.factories[name][1])
+                self._load(name)
+        return self
+
+    def start(self):
+        """Load the other components, each in its own background thread"""
+        if self._started is None:
+            self._started = time.perf_counter()
+        for name in self.factories:
+            if self._events[name].is_set():
+                continue
+            threading.Thread(
+                target=self._load,
+                args=(name,),
+                name=f'Load-{name}',
+                daemon=True
+            ).start()
+        return self
+
+    # ----------------------------------------------------------------------- #
+
+    def _load(self, name):
+        factory, depends = self.factories[name]
+        try:
+            for dependency in depends:
+                self.get(dependency)
+            start = time.perf_counter()
+            self.values[name] = factory()
+            self.timings[name] = time.perf_counter() - start
+            self.logger.info(
+                f"Loaded {name} in {self.timings[name]:.3f}s."
+            )
+        except Exception as e:
+            self.errors[name] = e
+            self.logger.exception(f"Failed to load {name}.")
+        finally:
+            with self._lock:
+                self._events[name].set()
+                waiters, self._waiters[name] = self._waiters[name], []
+            for waiter in waiters:
+                waiter.get_loop().call_soon_threadsafe(wake, waiter)
+            if all(event.is_set() for event in self._events.values()):
+                self.logger.info(self.report())
+
+    def report(self):
+        """Startup timing breakdown"""
+        lines = ["Startup timings:"]
+        for name in self.factories:
+            if name in self.errors:
+                lines.append(f"    {name:<16} failed")
+            elif name in self.timings:
+                lines.append(f"    {name:<16} {self.timings[name]:8.3f}s")
+            else:
+                lines.append(f"    {name:<16}  loading")
+        if self._started is not None:
+            elapsed = time.perf_counter() - self._started
+            lines.append(f"    {'(wall)':<16} {elapsed:8.3f}s")
+        return '\n'.join(lines)
+
+    # ----------------------------------------------------------------------- #
+
+    def is_ready(self, name):
+        return self._events[name].is_set() and name not in self.errors
+
+    def get(self, name, timeout=None):
+        """Component `name`, waiting (up to `timeout`) until it is loaded"""
+        if not self._events[name].wait(timeout):
+            raise ComponentError(f"{name} is not loaded yet.")
+        if name in self.errors:
+            raise ComponentError(f"{name} failed to load.")
+        return self.values[name]
+
+    async def wait(self, *names):
+        """
+        Wait until the components `names` are loaded
+
+        The loading thread wakes the waiting coroutines through their event
+        loop, so waiting does not hold a thread of the executor.
+        """
+        loop = asyncio.get_running_loop()
+        for name in names:
+            with self._lock:
+                if self._events[name].is_set():
+                    waiter = None
+                else:
+                    waiter = loop.create_future()
+                    self._waiters[name].append(waiter)
+            if waiter is not None:
+                await waiter
+            if name in self.errors:
+                raise ComponentError(f"{name} failed to load.")
+
+###############################################################################
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request Deadlines
+
+Every request has a time budget. The context of a request, holding its
+deadline, is set in a context variable when the request is dispatched, so
+that every stage (lookups, Heritage Platform, splitter, formatting) can see
+how much time is left without it being passed around, and give up on work
+that cannot finish in time.
+"""
+
+###############################################################################
+
+import time
+import asyncio
+import contextlib
+import contextvars
+
+###############################################################################
+
+REQUEST = contextvars.ContextVar('request', default=None)
+
+###############################################################################
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+###############################################################################
+
+
+class RequestContext:
+    def __init__(self, budget, name=''):
+        """
+        Deadline of a request
+
+        Parameters
+        ----------
+        budget : float
+            Time (in seconds) the request may take.
+        name : str, optional
+            Name of the request, for messages.
+            The default is ''.
+        """
+        self.name = name
+        self.budget = budget
+        self.deadline = time.monotonic() + budget
+        self.stage = None
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def check(self, stage):
+        """Raise DeadlineExceeded if there is no time left for `stage`"""
+        self.stage = stage
+        if self.expired:
+            raise DeadlineExceeded(
+                f"{self.name}: {self.budget}s exceeded before {stage}."
+            )
+
+    async def run(self, awaitable, stage):
+        """
+        Await `awaitable`, cancelled when the deadline passes
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline passes first
+        """
+        try:
+            self.check(stage)
+        except DeadlineExceeded:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            # a timeout of the stage itself is not a deadline
+            if not self.expired:
+                raise
+            raise DeadlineExceeded(
+                f"{self.name}: {self.budget}s exceeded in {stage}."
+            ) from None
+
+###############################################################################
+
+
+def current():
+    """Context of the current request, None outside of a request"""
+    return REQUEST.get()
+
+
+@contextlib.contextmanager
+def request_context(budget, name=''):
+    """Set the context of a request for the code within"""
+    context = RequestContext(budget, name)
+    token = REQUEST.set(context)
+    try:
+        yield context
+    finally:
+        REQUEST.reset(token)
+
+
+def check(stage):
+    """RequestContext.check() of the current request, if any"""
+    context = REQUEST.get()
+    if context is not None:
+        context.check(stage)
+
+
+async def within(awaitable, stage):
+    """RequestContext.run() of the current request, if any"""
+    context = REQUEST.get()
+    if context is None:
+        return await awaitable
+    return await context.run(awaitable, stage)
+
+###############################################################################
@@ -7,6 +7,8 @@ Created on Tue Nov  3 15:09:14 2020
 Updated on Sun Mar 20 00:11:33 2022
 
 @author: Hrishikesh Terdalkar
+
+Usage: python -m utils.dhatupatha
 """
 
 ###############################################################################
@@ -15,9 +17,10 @@ import os
 import re
 import cmd
 import json
+import hashlib
 from collections import defaultdict
 
-from indic_transliteration.sanscript import transliterate
+from utils.transliteration import transliterate
 
 ###############################################################################
 
@@ -123,8 +126,10 @@ class DhatuPatha:
         self.search_keys = search_keys or self.SEARCH_KEYS
         self.display_keys = display_keys or self.DISPLAY_KEYS
 
-        with open(dhatu_file, encoding='utf-8') as f:
-            self.index = json.load(f)
+        with open(dhatu_file, 'rb') as f:
+            content = f.read()
+        self.version = hashlib.sha1(content).hexdigest()[:12]
+        self.index = json.loads(content.decode('utf-8'))
 
         self.forms = {}
         for dhatu_idx, dhatu in self.index.items():
@@ -204,6 +209,15 @@ class DhatuPatha:
                         })
         return search_matches
 
+    def get_terms(self):
+        """Set of all strings that an exact (non-index) search can match"""
+        terms = set()
+        for dhatu_idx, dhatu in self.index.items():
+            terms.update(str(dhatu[key]) for key in self.search_keys)
+            for lakara_forms in self.forms[dhatu_idx].values():
+                terms.update(lakara_forms)
+        return terms
+
     def get(self, dhatu_idx):
         dhatu_idx = self.validate_index(dhatu_idx)
         return self.index.get(dhatu_idx, None)
@@ -8,8 +8,23 @@ Created on Tue Jan 24 16:54:18 2023
 
 ###############################################################################
 
+import re
 
-def fold(content, width=128):
+###############################################################################
+
+DEVANAGARI_PATTERN = re.compile(
+    r'^[\u0900-\u097F\u1CD0-\u1CFF\uA8E0-\uA8FF\u200C\u200D]+$'
+)
+
+###############################################################################
+
+
+def is_devanagari(text):
+    '''Check if `text` is a non-empty string of Devanagari characters'''
+    return DEVANAGARI_PATTERN.match(text) is not None
+
+
+def fold(content, width=128, length=len):
     '''
     Fold content such that each line is no longer than 'width'
         - breaks only at complete words
@@ -19,11 +34,13 @@ def fold(content, width=128):
 
     similar to linux command "fold -w `width` -s"
     except in the cases where there are spaces on the line boundaries
+
+    `length` measures a line or a word (e.g. its length in another script)
     '''
     lines = content.split('\n')
     folds = []
     for line in lines:
-        if len(line) > width:
+        if length(line) > width:
             words = line.split()
             linesplits = []
             curr_len = 0
@@ -31,7 +48,7 @@ def fold(content, width=128):
             idx = 0
             while idx < len(words):
                 is_nonempty = int(bool(curr_line))
-                new_len = curr_len + len(words[idx]) + is_nonempty
+                new_len = curr_len + length(words[idx]) + is_nonempty
                 if new_len <= width:
                     curr_line += ' ' * is_nonempty + words[idx]
                     curr_len = new_len
@@ -41,7 +58,7 @@ def fold(content, width=128):
                     if curr_line:
                         linesplits.append(curr_line.strip())
                         curr_line = ''
-                    if len(words[idx]) > width:
+                    if length(words[idx]) > width:
                         print(f"Warning: '{words[idx]}' longer than {width}.")
                         linesplits.append(words[idx])
                         idx += 1
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lexicon Lookups
+
+Read-only lookups on DhatuPatha and ShabdaPatha (search, conjugation and
+declension tables), either in the bot process or in worker processes that
+are forked from it after the data is loaded, so that the workers share the
+memory of the indexes (copy-on-write) instead of loading their own copies.
+Reloaded data is served by workers forked again from it.
+"""
+
+###############################################################################
+
+import gc
+import time
+import logging
+import threading
+
+from utils.workers import WorkerPool
+
+###############################################################################
+
+LOGGER = logging.getLogger(__name__)
+
+###############################################################################
+
+
+class Lexicon:
+    def __init__(self, dhatupatha, shabdapatha):
+        """
+        Lookups on loaded DhatuPatha and ShabdaPatha
+
+        Parameters
+        ----------
+        dhatupatha : DhatuPatha
+            DhatuPatha, not modified after it is loaded
+        shabdapatha : ShabdaPatha
+            ShabdaPatha, not modified after it is loaded
+        """
+        self.dhatupatha = dhatupatha
+        self.shabdapatha = shabdapatha
+
+    def search_dhatu(self, search_key):
+        return self.dhatupatha.search(search_key)
+
+    def search_shabda(self, search_key):
+        return self.shabdapatha.search(search_key)
+
+    def get_conjugations(self, dhatu_idx):
+        """Dhatu details and conjugation tables, None if not a dhatu"""
+        dhatu = self.dhatupatha.get(dhatu_idx)
+        if dhatu is None:
+            return None
+        return dhatu, self.dhatupatha.get_forms(dhatu_idx)
+
+    def get_declensions(self, word, gender):
+        """Declension table, None if the word is not in ShabdaPatha"""
+        shabda_idx = self.shabdapatha.get_word(word, gender)
+        if shabda_idx is None:
+            return None
+        return self.shabdapatha.get_forms(shabda_idx)
+
+###############################################################################
+
+
+def build_form_index(dhatupatha, shabdapatha, verb_command, word_command):
+    """
+    Commands that know a word or form, to answer plain queries directly
+    and to reject impossible /dhatu queries without a search
+
+    Parameters
+    ----------
+    dhatupatha : DhatuPatha
+        Loaded DhatuPatha
+    shabdapatha : ShabdaPatha
+        Loaded ShabdaPatha
+    verb_command : str
+        Command that searches DhatuPatha
+    word_command : str
+        Command that searches ShabdaPatha
+
+    Returns
+    -------
+    dict
+        Tuple of the commands that know a term, by term
+    """
+    verb_terms = dhatupatha.get_terms()
+    form_index = dict.fromkeys(verb_terms, (verb_command,))
+    for term in shabdapatha.get_terms():
+        form_index[term] = (
+            (verb_command, word_command) if term in verb_terms
+            else (word_command,)
+        )
+    return form_index
+
+###############################################################################
+
+
+def inherit(instance):
+    """Factory for a forked worker, returns the instance of the parent"""
+    return instance
+
+
+def prefork(lexicon, workers, timeout=10, threads=1):
+    """
+    Serve `lexicon` from worker processes forked from the current process
+
+    Objects that exist at this point are frozen (`gc.freeze`), so that the
+    garbage collector of a worker does not write to the pages holding the
+    indexes and they stay shared with the parent. Objects frozen by an
+    earlier call are unfrozen first, so that replaced data can be freed.
+
+    Forking a process that runs other threads is unsafe (a lock held by one
+    of them stays locked in the child), so at startup, this must be called
+    before any thread is started. Workers forked later (on reload) only
+    serve lookups on the data they inherit.
+
+    Parameters
+    ----------
+    lexicon : Lexicon
+        Lexicon, with the data already loaded
+    workers : int
+        Number of worker processes
+    timeout : float, optional
+        Time (in seconds) after which a call is abandoned.
+        The default is 10.
+    threads : int, optional
+        Number of concurrent calls served by a worker.
+        The default is 1.
+
+    Returns
+    -------
+    WorkerPool
+        Started pool, with the methods of Lexicon
+    """
+    if threading.active_count() > 1:
+        LOGGER.warning(
+            f"Forking with {threading.active_count()} threads running."
+        )
+    start = time.perf_counter()
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+    pool = WorkerPool(
+        inherit,
+        (lexicon,),
+        replicas=workers,
+        timeout=timeout,
+        threads=threads,
+        start_method='fork'
+    ).start()
+    LOGGER.info(
+        f"Forked {workers} lexicon workers in "
+        f"{time.perf_counter() - start:.3f}s "
+        f"({gc.get_freeze_count()} objects frozen)."
+    )
+    return pool
+
+###############################################################################
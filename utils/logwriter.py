@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only Log Writer
+
+Records (e.g. user suggestions) are queued by the caller without any disk
+I/O, and appended to a JSON Lines file in batches by a background task.
+"""
+
+###############################################################################
+
+import os
+import json
+import time
+import asyncio
+import logging
+
+###############################################################################
+
+BATCH_SIZE = 256
+FSYNC_INTERVAL = 5.0
+
+###############################################################################
+
+
+class LogWriter:
+    def __init__(self, path, batch_size=BATCH_SIZE,
+                 fsync_interval=FSYNC_INTERVAL):
+        """
+        Batched, asynchronous JSON Lines writer
+
+        Parameters
+        ----------
+        path : str
+            Path of the log file. Records are appended to it.
+        batch_size : int, optional
+            Maximum number of records written at once.
+            The default is BATCH_SIZE.
+        fsync_interval : float, optional
+            Maximum time (in seconds) for which written records may stay
+            in the OS buffers before they are synced to the disk.
+            The default is FSYNC_INTERVAL.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.queue = None
+        self.written = 0
+
+        self._file = None
+        self._task = None
+        self._dirty = False
+        self._last_fsync = 0
+
+    # ----------------------------------------------------------------------- #
+
+    def write(self, record):
+        """Queue a record, to be written in the background"""
+        if self._task is None:
+            self.queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+        self.queue.put_nowait(record)
+
+    async def close(self):
+        """Write the queued records and close the file"""
+        if self._task is None:
+            return
+        self.queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    # ----------------------------------------------------------------------- #
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closed = False
+        while not closed:
+            try:
+                record = await asyncio.wait_for(
+                    self.queue.get(), timeout=self.fsync_interval
+                )
+            except asyncio.TimeoutError:
+                if self._dirty:
+                    await loop.run_in_executor(None, self._fsync)
+                continue
+
+            batch = []
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= self.batch_size or self.queue.empty():
+                    break
+                record = self.queue.get_nowait()
+            closed = record is None
+
+            try:
+                await loop.run_in_executor(None, self._write, batch, closed)
+            except OSError:
+                self.logger.exception(f"Could not write {len(batch)} records.")
+
+        await loop.run_in_executor(None, self._close)
+
+    def _write(self, records, sync=False):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+        self._file.write(''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records
+        ))
+        self._file.flush()
+        self.written += len(records)
+        self._dirty = True
+        if sync or time.monotonic() - self._last_fsync > self.fsync_interval:
+            self._fsync()
+
+    def _fsync(self):
+        if self._file is not None and self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _close(self):
+        if self._file is not None:
+            self._fsync()
+            self._file.close()
+            self._file = None
+
+###############################################################################
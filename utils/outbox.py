@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Outbound Message Dispatcher
+
+Replies are queued per chat and sent by a few background workers, within
+the per-chat and global rate limits of Telegram. Adjacent small messages to
+a chat are combined into one, and a FloodWait pauses only the affected
+chat before the messages are retried.
+"""
+
+###############################################################################
+
+import asyncio
+import logging
+from collections import Counter, deque
+
+from telethon.errors import FloodWaitError
+
+from utils.cache import Cache
+from utils.scheduler import TokenBucket
+
+###############################################################################
+
+MAX_MESSAGE_LENGTH = 4096
+MESSAGE_SEPARATOR = '\n\n'
+
+# Telegram allows about 30 messages per second in total,
+# and about one message per second to a chat
+GLOBAL_RATE = 25
+GLOBAL_BURST = 30
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+
+MAX_RETRIES = 3
+MAX_CHATS = 65536
+
+###############################################################################
+
+
+class OutgoingMessage:
+    def __init__(self, entity, text, kwargs, future, combine=True):
+        self.entity = entity
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+        self.combine = combine
+        self.attempts = 0
+
+    @property
+    def combinable(self):
+        return (
+            self.combine
+            and isinstance(self.text, str)
+            and 'buttons' not in self.kwargs
+            and 'file' not in self.kwargs
+        )
+
+
+class Outbox:
+    def __init__(
+        self,
+        client,
+        workers=4,
+        global_rate=GLOBAL_RATE,
+        global_burst=GLOBAL_BURST,
+        chat_rate=CHAT_RATE,
+        chat_burst=CHAT_BURST,
+        max_length=MAX_MESSAGE_LENGTH,
+        max_retries=MAX_RETRIES
+    ):
+        """
+        Rate limited, per-chat ordered message sender
+
+        Parameters
+        ----------
+        client : telethon.TelegramClient
+            Client to send the messages with.
+        workers : int, optional
+            Number of messages being sent at a time (to different chats).
+            The default is 4.
+        global_rate : float, optional
+            Messages per second, in total.
+            The default is GLOBAL_RATE.
+        global_burst : int, optional
+            Messages sent at once, in total.
+            The default is GLOBAL_BURST.
+        chat_rate : float, optional
+            Messages per second to a chat.
+            The default is CHAT_RATE.
+        chat_burst : int, optional
+            Messages sent at once to a chat.
+            The default is CHAT_BURST.
+        max_length : int, optional
+            Maximum length of a combined message.
+            The default is MAX_MESSAGE_LENGTH.
+        max_retries : int, optional
+            Number of retries of a message after a FloodWait.
+            The default is MAX_RETRIES.
+        """
+        self.client = client
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_length = max_length
+        self.max_retries = max_retries
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.stats = Counter()
+
+        self.bucket = TokenBucket(global_rate, global_burst)
+        self.chat_buckets = Cache('chat-buckets', maxsize=MAX_CHATS)
+
+        self._queues = {}
+        self._ready = None
+        self._tasks = []
+
+    # ----------------------------------------------------------------------- #
+
+    def send(self, chat_id, text, entity=None, combine=True, **kwargs):
+        """
+        Queue a message for `chat_id`
+
+        Parameters
+        ----------
+        chat_id : int
+            ID of the chat, messages to a chat are sent in order.
+        text : str
+            Message.
+        entity : optional
+            Entity to send the message to, if different from `chat_id`
+            (e.g. an InputPeer). The default is None.
+        combine : bool, optional
+            If False, the message is sent on its own, e.g. if it is going
+            to be edited. Otherwise, it may be combined with the adjacent
+            messages, and the future then resolves to the combined Message.
+            The default is True.
+        **kwargs
+            Passed on to `client.send_message`.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to the sent Message, or to None if it could not be sent
+        """
+        if self._ready is None:
+            self._start()
+
+        future = asyncio.get_running_loop().create_future()
+        message = OutgoingMessage(
+            entity if entity is not None else chat_id, text, kwargs, future,
+            combine=combine
+        )
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            # a chat is queued for the workers only once at a time
+            queue = self._queues[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        queue.append(message)
+        self.stats['queued'] += 1
+        return future
+
+    def _start(self):
+        self._ready = asyncio.Queue()
+        self._tasks = [
+            asyncio.ensure_future(self._work()) for _ in range(self.workers)
+        ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+        for queue in self._queues.values():
+            for message in queue:
+                self._resolve(message, None)
+        self._queues.clear()
+
+    # ----------------------------------------------------------------------- #
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets.set(chat_id, bucket)
+        return bucket
+
+    def _take(self, queue):
+        """Next message of a chat, combined with the adjacent small ones"""
+        batch = [queue.popleft()]
+        first = batch[0]
+        if not first.combinable:
+            return batch
+
+        length = len(first.text)
+        while queue:
+            message = queue[0]
+            length += len(MESSAGE_SEPARATOR) + len(message.text or '')
+            if (
+                not message.combinable
+                or message.kwargs != first.kwargs
+                or message.entity != first.entity
+                or length > self.max_length
+            ):
+                break
+            batch.append(queue.popleft())
+        return batch
+
+    def _resolve(self, message, result):
+        if not message.future.done():
+            message.future.set_result(result)
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues[chat_id]
+
+            # a chat is held by one worker at a time, but the global bucket
+            # is shared by all the workers
+            chat_bucket = self._chat_bucket(chat_id)
+            if not chat_bucket.consume():
+                loop.call_later(
+                    chat_bucket.wait_time(), self._ready.put_nowait, chat_id
+                )
+                continue
+            while not self.bucket.consume():
+                await asyncio.sleep(self.bucket.wait_time())
+
+            batch = self._take(queue)
+            first = batch[0]
+            text = MESSAGE_SEPARATOR.join(message.text for message in batch)
+
+            delay = 0
+            try:
+                result = await self.client.send_message(
+                    first.entity, text, **first.kwargs
+                )
+            except FloodWaitError as e:
+                first.attempts += 1
+                if first.attempts > self.max_retries:
+                    self.logger.error(f"Giving up on {chat_id}: {e}")
+                    self.stats['failed'] += len(batch)
+                    for message in batch:
+                        self._resolve(message, None)
+                else:
+                    # retried (and combined again) after the wait
+                    delay = e.seconds * 2 ** (first.attempts - 1)
+                    self.logger.warning(
+                        f"FloodWait for {chat_id}, retrying in {delay}s."
+                    )
+                    self.stats['flood_waits'] += 1
+                    queue.extendleft(reversed(batch))
+            except Exception:
+                self.logger.exception(f"Could not send to {chat_id}.")
+                self.stats['failed'] += len(batch)
+                for message in batch:
+                    self._resolve(message, None)
+            else:
+                self.stats['sent'] += 1
+                self.stats['combined'] += len(batch) - 1
+                for message in batch:
+                    self._resolve(message, result)
+
+            if not queue:
+                del self._queues[chat_id]
+            elif delay:
+                loop.call_later(delay, self._ready.put_nowait, chat_id)
+            else:
+                self._ready.put_nowait(chat_id)
+
+###############################################################################
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paginated Results
+
+Long results (e.g. search matches, conjugation tables of all lakaras) are
+split into pages that are rendered only when requested, through a
+short-lived handle that inline buttons refer to.
+"""
+
+###############################################################################
+
+import io
+import secrets
+import itertools
+
+from utils.cache import Cache
+
+###############################################################################
+
+MAX_PAGINATIONS = 4096
+PAGINATION_TTL = 30 * 60
+
+###############################################################################
+
+
+class Pagination:
+    def __init__(self, render, count, labels=None, document=None,
+                 render_document=None):
+        """
+        Pages of a result, rendered on demand
+
+        Parameters
+        ----------
+        render : callable
+            Coroutine function that renders the page with the given index
+        count : int
+            Number of pages
+        labels : list, optional
+            Short label of every page (e.g. the name of a lakara), to be
+            shown on buttons for direct access.
+            The default is None.
+        document : str, optional
+            File name, if the result may be sent as a single document.
+            The default is None.
+        render_document : callable, optional
+            Coroutine function that renders the text of the document,
+            e.g. without the parts repeated on every page.
+            The default is None (all the pages, one after another).
+        """
+        self.render = render
+        self.count = count
+        self.labels = labels
+        self.document = document
+        self.render_document = render_document
+        self._pages = {}
+
+    async def page(self, idx):
+        if idx not in self._pages:
+            self._pages[idx] = await self.render(idx)
+        return self._pages[idx]
+
+    async def as_document(self):
+        """All pages as a text file, with the Markdown code fences removed"""
+        if self.render_document is not None:
+            content = await self.render_document()
+        else:
+            pages = [await self.page(idx) for idx in range(self.count)]
+            content = '\n\n'.join(pages)
+        content = content.replace('```', '')
+        document = io.BytesIO(content.encode('utf-8'))
+        document.name = self.document
+        return document
+
+###############################################################################
+
+
+class PageStore:
+    def __init__(self, maxsize=MAX_PAGINATIONS, ttl=PAGINATION_TTL):
+        """
+        Paginations of recent results, by handle
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of paginations kept.
+            The default is MAX_PAGINATIONS.
+        ttl : float, optional
+            Time (in seconds) for which a pagination is kept.
+            The default is PAGINATION_TTL.
+        """
+        self.cache = Cache('pages', maxsize=maxsize, ttl=ttl)
+        # handles of an earlier run of the bot must not match new ones
+        self._prefix = secrets.token_hex(2)
+        self._ids = itertools.count(1)
+
+    def add(self, pagination):
+        """Store a pagination, return its handle"""
+        handle = f'{self._prefix}{next(self._ids):x}'
+        self.cache.set(handle, pagination)
+        return handle
+
+    def get(self, handle):
+        return self.cache.get(handle)
+
+###############################################################################
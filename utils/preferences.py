@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+User Preferences
+
+Per-user preferences (e.g. the input transliteration scheme) kept in memory
+and persisted to SQLite in the background, shared by every process using
+the same database file.
+"""
+
+###############################################################################
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+###############################################################################
+
+SYNC_INTERVAL = 2.0
+
+###############################################################################
+
+
+class PreferenceStore:
+    def __init__(self, path, sync_interval=SYNC_INTERVAL):
+        """
+        Preferences with an in-memory copy and write-behind persistence
+
+        Reads are served from memory. Writes are applied in memory at once,
+        and written to the database in batches every `sync_interval`
+        seconds, when the changes made by other processes are also read.
+
+        Parameters
+        ----------
+        path : str
+            Path of the SQLite database.
+        sync_interval : float, optional
+            Time (in seconds) between two synchronizations.
+            The default is SYNC_INTERVAL.
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.preferences = {}
+        self.pending = {}
+        self.seq = 0
+        self.connection = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ----------------------------------------------------------------------- #
+
+    def start(self):
+        """Open the database, load all preferences, start syncing"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(
+            self.path,
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS preferences ('
+            'user_id INTEGER, key TEXT, value TEXT, seq INTEGER, '
+            'PRIMARY KEY (user_id, key))'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS preferences_seq ON preferences (seq)'
+        )
+        self._pull()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop syncing, write the pending changes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.connection is not None:
+            self.sync()
+            self.connection.close()
+            self.connection = None
+
+    # ----------------------------------------------------------------------- #
+
+    def get(self, user_id, key, default=None):
+        return self.preferences.get(user_id, {}).get(key, default)
+
+    def set(self, user_id, key, value):
+        with self._lock:
+            self.preferences.setdefault(user_id, {})[key] = value
+            self.pending[(user_id, key)] = value
+
+    # ----------------------------------------------------------------------- #
+
+    def sync(self):
+        """Write the pending changes, read the changes of other processes"""
+        self._flush()
+        self._pull()
+
+    def _run(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except sqlite3.Error:
+                self.logger.exception("Preference sync failed.")
+
+    def _flush(self):
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+
+        try:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO preferences '
+                '(user_id, key, value, seq) VALUES (?, ?, ?, '
+                '(SELECT IFNULL(MAX(seq), 0) + 1 FROM preferences))',
+                [
+                    (user_id, key, json.dumps(value))
+                    for (user_id, key), value in pending.items()
+                ]
+            )
+            self.connection.execute('COMMIT')
+        except sqlite3.Error:
+            if self.connection.in_transaction:
+                self.connection.execute('ROLLBACK')
+            # retried with the next sync, unless changed in the meantime
+            with self._lock:
+                for pending_key, value in pending.items():
+                    self.pending.setdefault(pending_key, value)
+            raise
+
+    def _pull(self):
+        rows = self.connection.execute(
+            'SELECT user_id, key, value, seq FROM preferences '
+            'WHERE seq > ? ORDER BY seq',
+            (self.seq,)
+        ).fetchall()
+        with self._lock:
+            for user_id, key, value, seq in rows:
+                # local changes not written yet take precedence
+                if (user_id, key) not in self.pending:
+                    self.preferences.setdefault(user_id, {})[key] = (
+                        json.loads(value)
+                    )
+                self.seq = max(self.seq, seq)
+
+    # ----------------------------------------------------------------------- #
+
+    def __len__(self):
+        return len(self.preferences)
+
+###############################################################################
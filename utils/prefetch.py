@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Speculative Prefetching
+
+Follow-up commands (e.g. /sr_ and /dr_ links) are almost always requested
+right after a search reply. Prefetcher computes their results in the
+background so that the follow-up is answered from the cache.
+"""
+
+###############################################################################
+
+import asyncio
+import logging
+
+from utils.scheduler import LazySemaphore
+
+###############################################################################
+
+
+class Prefetcher:
+    def __init__(self, fetch, cache, concurrency=4, executor=None):
+        """
+        Warm a cache in the background with bounded concurrency
+
+        Parameters
+        ----------
+        fetch : callable
+            Blocking function that computes the value for a key.
+            It is called as `fetch(*key)` in `executor`.
+            A return value of None is never cached.
+        cache : Cache
+            Cache to store the fetched values in
+        concurrency : int, optional
+            Maximum number of background fetches running at a time.
+            The default is 4.
+        executor : concurrent.futures.Executor, optional
+            Executor to run `fetch` in.
+            The default is None (the default executor of the event loop).
+        """
+        self.fetch = fetch
+        self.cache = cache
+        self.concurrency = concurrency
+        self.executor = executor
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._pending = {}
+        self._semaphore = LazySemaphore(concurrency)
+
+    async def _fetch(self, key, bounded):
+        loop = asyncio.get_running_loop()
+        if bounded:
+            async with self._semaphore:
+                value = await loop.run_in_executor(
+                    self.executor, self.fetch, *key
+                )
+        else:
+            value = await loop.run_in_executor(self.executor, self.fetch, *key)
+
+        if value is not None:
+            self.cache.set(key, value)
+        return value
+
+    def _schedule(self, key, bounded):
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, bounded))
+            task.add_done_callback(lambda t: self._done(key, t))
+            self._pending[key] = task
+        return task
+
+    def _done(self, key, task):
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning(
+                f"Prefetch failed for {key}: {task.exception()!r}"
+            )
+
+    def prefetch(self, keys):
+        """Schedule background fetches for the keys that are not cached"""
+        for key in keys:
+            if key not in self.cache:
+                self._schedule(key, bounded=True)
+
+    async def get(self, key):
+        """
+        Get the value for a key
+
+        Served from the cache if available, otherwise joins a pending
+        prefetch of the same key or fetches it right away.
+        """
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        task = self._schedule(key, bounded=False)
+        return await asyncio.shield(task)
+
+###############################################################################
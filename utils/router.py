@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command Router
+
+Prefix trie of command names and aliases, to find the command at the start
+of a message in a single pass over its first word, irrespective of the
+number of commands.
+"""
+
+###############################################################################
+
+_END = None
+
+###############################################################################
+
+
+class CommandTrie:
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def add(self, key, value, prefix=False):
+        """
+        Add a command
+
+        Parameters
+        ----------
+        key : str
+            Command name, e.g. '/dhatu' or an alias 'धातु'
+        value : object
+            Value returned by `match`, e.g. the handler
+        prefix : bool, optional
+            If True, `key` matches at the start of a word,
+            e.g. '/dr_' matches '/dr_1_0001'.
+            Otherwise, it must be followed by whitespace or the end of text.
+            The default is False.
+        """
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        if _END not in node:
+            self.size += 1
+        node[_END] = (value, prefix)
+
+    def match(self, text):
+        """
+        Longest command at the start of `text`
+
+        Returns
+        -------
+        tuple or None
+            (value, end), where `end` is the position in `text` right after
+            the command, or None if no command matches
+        """
+        node = self.root
+        best = None
+        for idx in range(len(text) + 1):
+            if _END in node:
+                value, prefix = node[_END]
+                if prefix or idx == len(text) or text[idx].isspace():
+                    best = (value, idx)
+            if idx == len(text):
+                break
+            node = node.get(text[idx])
+            if node is None:
+                break
+        return best
+
+    def __len__(self):
+        return self.size
+
+###############################################################################
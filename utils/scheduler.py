@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request Scheduler
+
+Requests are run in lanes (e.g. 'fast' for local lookups, 'slow' for the
+Heritage Platform and the splitter), each with its own concurrency limit,
+bounded queue and per-user quota, so that expensive requests, or a single
+user, cannot hold up everyone else.
+"""
+
+###############################################################################
+
+import time
+import asyncio
+import logging
+from collections import Counter
+
+from utils.cache import Cache
+
+###############################################################################
+
+MAX_USERS = 65536
+
+###############################################################################
+
+
+class Overloaded(Exception):
+    pass
+
+
+class RateLimited(Exception):
+    pass
+
+###############################################################################
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        """
+        Token bucket, refilled at `rate` tokens per second up to `capacity`
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def consume(self, tokens=1):
+        self._refill()
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def wait_time(self, tokens=1):
+        """Time (in seconds) until `tokens` can be consumed"""
+        self._refill()
+        return max(0, (tokens - self.tokens) / self.rate)
+
+###############################################################################
+
+
+class LazySemaphore:
+    def __init__(self, value):
+        """
+        asyncio.Semaphore created on first use
+
+        Objects created at import time (before the event loop is running)
+        get a semaphore bound to the loop that actually uses it.
+        """
+        self.value = value
+        self._semaphore = None
+
+    def get(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.value)
+        return self._semaphore
+
+    async def acquire(self):
+        return await self.get().acquire()
+
+    def release(self):
+        self.get().release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+###############################################################################
+
+
+class Lane:
+    def __init__(
+        self,
+        name,
+        concurrency,
+        queue_size,
+        user_rate,
+        user_burst,
+        max_users=MAX_USERS
+    ):
+        """
+        Requests of one class, with admission control
+
+        Parameters
+        ----------
+        name : str
+            Name of the lane.
+        concurrency : int
+            Maximum number of requests running at a time.
+        queue_size : int
+            Maximum number of requests waiting to run. Further requests
+            are rejected with Overloaded.
+        user_rate : float
+            Requests per second allowed to a user in the long run.
+        user_burst : int
+            Requests a user may make at once. Further requests are
+            rejected with RateLimited.
+        max_users : int, optional
+            Number of users whose quota is tracked.
+            The default is MAX_USERS.
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+
+        self.waiting = 0
+        self.running = 0
+        self.stats = Counter()
+        self.buckets = Cache('user-buckets', maxsize=max_users)
+        self._semaphore = LazySemaphore(concurrency)
+
+    def admit(self, user_id):
+        """Raise RateLimited or Overloaded if the request is not admitted"""
+        # a request shed for load does not count against the user's quota
+        if self.running >= self.concurrency and (
+            self.waiting >= self.queue_size
+        ):
+            self.stats['shed'] += 1
+            raise Overloaded(f"{self.name}: {self.waiting} waiting.")
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self.buckets.set(user_id, bucket)
+        if not bucket.consume():
+            self.stats['rate_limited'] += 1
+            raise RateLimited(f"{self.name}: quota of {user_id} exceeded.")
+
+    async def run(self, user_id, function, *args):
+        self.admit(user_id)
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        self.stats['admitted'] += 1
+        try:
+            return await function(*args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+###############################################################################
+
+
+class Scheduler:
+    def __init__(self, lanes):
+        """
+        Run requests in lanes
+
+        Parameters
+        ----------
+        lanes : list
+            List of Lane objects
+        """
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def run(self, lane, user_id, function, *args):
+        """
+        Run the coroutine function `function(*args)` in `lane`
+
+        Raises
+        ------
+        RateLimited
+            If the user has exceeded their quota in the lane
+        Overloaded
+            If the lane is full
+        """
+        return await self.lanes[lane].run(user_id, function, *args)
+
+    def report(self):
+        return ', '.join(
+            f"{lane.name}: {lane.running} running, {lane.waiting} waiting "
+            f"({dict(lane.stats)})"
+            for lane in self.lanes.values()
+        )
+
+###############################################################################
@@ -13,8 +13,7 @@ Updated on Sun Mar 20 00:13:20 2022
 
 import re
 import json
-
-import sanskrit_text as skt
+import hashlib
 
 ###############################################################################
 
@@ -60,8 +59,10 @@ class ShabdaPatha:
         self.search_keys = search_keys or self.SEARCH_KEYS
         self.display_keys = display_keys or self.DISPLAY_KEYS
 
-        with open(shabda_file, encoding='utf-8') as f:
-            self.index = json.load(f)
+        with open(shabda_file, 'rb') as f:
+            content = f.read()
+        self.version = hashlib.sha1(content).hexdigest()[:12]
+        self.index = json.loads(content.decode('utf-8'))
 
         self.antya_index = {}
         for idx, word in self.index.items():
@@ -136,7 +137,19 @@ class ShabdaPatha:
                         })
         return search_matches
 
+    def get_terms(self):
+        """Set of all words and their forms"""
+        terms = set()
+        for shabda in self.index.values():
+            terms.update(shabda[key] for key in self.search_keys)
+            for form in shabda['forms']:
+                if form != '-':
+                    terms.update(form.split('-'))
+        return terms
+
     def get_similar(self, word, linga=None):
+        import sanskrit_text as skt
+
         last_varna = skt.split_varna_word(word, False)[-1]
         last_varna = last_varna.replace(skt.HALANTA, '')
         print(last_varna)
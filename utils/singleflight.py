@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-Flight Requests
+
+Concurrent requests for the same key (e.g. a word shared in a group and
+looked up by many users at once) wait on a single in-progress computation
+and all receive its result.
+"""
+
+###############################################################################
+
+import asyncio
+import logging
+from collections import Counter
+
+###############################################################################
+
+
+class SingleFlight:
+    def __init__(self):
+        """Coalesce concurrent calls with the same key into one"""
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.stats = Counter()
+        self._pending = {}
+
+    async def run(self, key, function, *args):
+        """
+        Result of `function(*args)`, shared by concurrent calls with `key`
+
+        `function` may be a coroutine function, otherwise it is run in the
+        default executor. A caller that is cancelled (e.g. on a timeout)
+        does not cancel the computation for the other callers.
+        """
+        task = self._pending.get(key)
+        if task is None:
+            self.stats['calls'] += 1
+            task = asyncio.ensure_future(self._call(function, *args))
+            task.add_done_callback(lambda t: self._done(key, t))
+            self._pending[key] = task
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    async def _call(self, function, *args):
+        if asyncio.iscoroutinefunction(function):
+            return await function(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, function, *args)
+
+    def _done(self, key, task):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        # retrieved here, in case every caller has given up on it
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.debug(f"{key} failed: {task.exception()!r}")
+
+    def __len__(self):
+        return len(self._pending)
+
+###############################################################################
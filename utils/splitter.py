@@ -16,18 +16,23 @@ https://github.com/OliverHellwig/sanskrit/tree/master/papers/2018emnlp
 
 import os
 import sys
+import json
+import time
 import logging
+import itertools
+import argparse
+import statistics
 import tempfile
-import functools
+import threading
 import contextlib
+import unicodedata
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 
 from indic_transliteration import sanscript
 
-###############################################################################
-# Sandhi Related
-
-import tensorflow.compat.v1 as tf
-tf.disable_v2_behavior()
+from utils.batching import BatchScheduler
+from utils.cache import Cache, DiskCache
 
 ###############################################################################
 
@@ -37,15 +42,209 @@ INSTALL_DIR = os.path.join(GIT_DIR, 'papers', '2018emnlp', 'code')
 ###############################################################################
 
 MAX_CACHE = 1024
+MAX_DISK_CACHE_BYTES = 256 * 1024 * 1024
+STATS_INTERVAL = 1000
+
+FILE_CHUNK_SIZE = 256
+FILE_WORKERS = 4
+
+# Representative (IAST) inputs for warm-up and benchmark
+WARMUP_LINES = [
+    "rāmo rājamaṇiḥ sadā vijayate",
+    "dharmakṣetre kurukṣetre samavetā yuyutsavaḥ",
+    "tapaḥsvādhyāyanirataṃ tapasvī vāgvidāṃ varam",
+    "nāradaṃ paripapraccha vālmīkirmunipuṅgavam",
+    "karmaṇyevādhikāraste mā phaleṣu kadācana "
+    "mā karmaphalaheturbhūrmā te saṅgo'stvakarmaṇi",
+]
+PROTECTED_NODES = [
+    'inputs', 'split_cnts', 'dropout_keep_prob', 'seqlens', 'predictions'
+]
+
+BATCH_SIZE = 64
+BATCH_WAIT = 0.005
+
+# anonymous in-memory files, accessible through /proc/self/fd/
+USE_MEMFD = hasattr(os, 'memfd_create') and os.path.isdir('/proc/self/fd')
+
+###############################################################################
+
+
+@contextlib.contextmanager
+def scratch_paths(*names, tmp_dir=None):
+    """Paths to private scratch files, discarded on exit
+
+    Anonymous in-memory files (memfd) are used where available, so that no
+    data touches the disk. Otherwise, the files are created in a private
+    temporary directory. Paths are unique for every call in either case.
+
+    Parameters
+    ----------
+    *names : str
+        Names of the scratch files
+    tmp_dir : str, optional
+        Parent of the temporary directory, if memfd is not available.
+        The default is None.
+
+    Yields
+    ------
+    list
+        Paths of the scratch files
+    """
+    if USE_MEMFD:
+        fds = [os.memfd_create(name) for name in names]
+        try:
+            yield [f'/proc/self/fd/{fd}' for fd in fds]
+        finally:
+            for fd in fds:
+                os.close(fd)
+    else:
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as dirname:
+            yield [os.path.join(dirname, name) for name in names]
+
+###############################################################################
+
+
+def load_tensorflow():
+    """TensorFlow (v1 API), imported only when a model is loaded"""
+    import tensorflow.compat.v1 as tf
+    tf.disable_v2_behavior()
+    return tf
+
+
+def pad(sequence, length, value=0):
+    """Sequence padded with `value` to `length` entries"""
+    return list(sequence) + [value] * (length - len(sequence))
+
+
+def normalize_line(line):
+    """Normalized form of a line of IAST text, the key of the split cache"""
+    return ' '.join(unicodedata.normalize('NFC', line).split())
+
+###############################################################################
+
+
+class SplitCache:
+    def __init__(self, path=None, maxsize=MAX_CACHE,
+                 max_bytes=MAX_DISK_CACHE_BYTES):
+        """Cache of split lines, in memory in front of an on-disk cache
+
+        Parameters
+        ----------
+        path : str, optional
+            Path to the on-disk cache, shared by all processes using it.
+            If None, only the in-memory cache is used.
+            The default is None.
+        maxsize : int, optional
+            Number of lines in the in-memory cache.
+            The default is MAX_CACHE.
+        max_bytes : int, optional
+            Size budget of the on-disk cache.
+            The default is MAX_DISK_CACHE_BYTES.
+        """
+        self.memory = Cache('splits', maxsize=maxsize)
+        self.disk = DiskCache(path, max_bytes=max_bytes) if path else None
+        self.stats = Counter()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+            lookups = self.stats['lookups'] = self.stats['lookups'] + 1
+        if lookups % STATS_INTERVAL == 0:
+            self.logger.info(self.report())
+
+    def get(self, line):
+        value = self.memory.get(line)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+        if self.disk is not None:
+            value = self.disk.get(line)
+            if value is not None:
+                self.memory.set(line, value)
+                self._count('disk_hits')
+                return value
+        self._count('misses')
+        return None
+
+    def set(self, line, value):
+        self.memory.set(line, value)
+        if self.disk is not None:
+            self.disk.set(line, value)
+
+    def hit_rate(self):
+        lookups = self.stats['lookups']
+        if not lookups:
+            return 0.0
+        return (self.stats['memory_hits'] + self.stats['disk_hits']) / lookups
+
+    def report(self):
+        return (
+            f"Split cache: {self.stats['lookups']} lookups, "
+            f"{self.stats['memory_hits']} memory hits, "
+            f"{self.stats['disk_hits']} disk hits, "
+            f"{self.stats['misses']} misses "
+            f"(hit rate {self.hit_rate():.1%})"
+        )
 
 ###############################################################################
 
 
 class Splitter:
-    def __init__(self, base_dir, tmp_dir=None):
+    def __init__(self, base_dir, tmp_dir=None,
+                 batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT,
+                 cache_file=None, intra_op_threads=0, inter_op_threads=0,
+                 optimize=False, warmup=True, use_files=False):
+        """In-memory Sandhi and Samaasa Splitter
+
+        Parameters
+        ----------
+        base_dir : str
+            Path to the code directory of the splitter
+        tmp_dir : str, optional
+            Directory for scratch files (with `use_files`), if memfd is not
+            available. The default is None.
+        batch_size : int, optional
+            Maximum number of lines split in a single model run.
+            Lines from concurrent calls that arrive within `batch_wait`
+            seconds are batched together. Batching is disabled if 1.
+            The default is BATCH_SIZE.
+        batch_wait : float, optional
+            Time (in seconds) to wait for lines from concurrent calls.
+            The default is BATCH_WAIT.
+        cache_file : str, optional
+            Path to the on-disk cache of split lines.
+            If None, split lines are cached in memory only.
+            The default is None.
+        intra_op_threads : int, optional
+            Threads used within a TensorFlow op, 0 lets TensorFlow decide.
+            The default is 0.
+        inter_op_threads : int, optional
+            Threads used to run independent ops, 0 lets TensorFlow decide.
+            The default is 0.
+        optimize : bool, optional
+            If True, the graph is frozen (variables folded into constants)
+            and stripped of training-only nodes after loading.
+            The default is False.
+        warmup : bool, optional
+            If True, representative inputs are split once before the
+            splitter is marked ready, so that the first request does not
+            pay for graph optimisation and allocation.
+            The default is True.
+        use_files : bool, optional
+            If True, lines are passed to the model through scratch files
+            (by `helper_functions.analyze_text`), instead of being encoded
+            and fed to the session in memory. This is also the fallback if
+            the data loader cannot encode lines.
+            The default is False.
+        """
+        tf = load_tensorflow()
         self.base_dir = base_dir
         self.tmp_dir = tempfile.gettempdir() if tmp_dir is None else tmp_dir
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.cache = SplitCache(cache_file)
 
         # Import Helper Modules from Base Directory
         sys.path.insert(0, self.base_dir)
@@ -61,9 +260,28 @@ class Splitter:
         )
         self.analyze_text = helper_functions.analyze_text
 
+        if not use_files and not all(
+            hasattr(self.sandhi_data, name)
+            for name in ['encode_line', 'decode_line']
+        ):
+            self.logger.warning(
+                "Data loader cannot encode lines in memory, "
+                "using scratch files."
+            )
+            use_files = True
+        self.use_files = use_files
+
+        self.ready = False
+        self.session_config = tf.ConfigProto(
+            intra_op_parallelism_threads=intra_op_threads,
+            inter_op_parallelism_threads=inter_op_threads
+        )
+
         self.graph = tf.Graph()
         with self.graph.as_default():
-            self.sess = tf.Session(graph=self.graph)
+            self.sess = tf.Session(
+                graph=self.graph, config=self.session_config
+            )
             model_dir = model_dir = os.path.normpath(
                 os.path.join(
                     self.base_dir,
@@ -77,12 +295,61 @@ class Splitter:
             )
             print('OK')
 
+        if optimize:
+            self._optimize_graph()
+
         self.x_ph = self.graph.get_tensor_by_name('inputs:0')
         self.split_cnts_ph = self.graph.get_tensor_by_name('split_cnts:0')
         self.dropout_ph = self.graph.get_tensor_by_name('dropout_keep_prob:0')
         self.seqlen_ph = self.graph.get_tensor_by_name('seqlens:0')
         self.predictions_ph = self.graph.get_tensor_by_name('predictions:0')
 
+        self.batcher = None
+        if batch_size > 1:
+            self.batcher = BatchScheduler(
+                self._split_lines,
+                max_batch_size=batch_size,
+                max_wait=batch_wait
+            )
+
+        if warmup:
+            self.warmup()
+        self.ready = True
+
+    def _optimize_graph(self):
+        """Freeze variables into constants and strip training-only nodes"""
+        tf = load_tensorflow()
+        graph_def = tf.graph_util.convert_variables_to_constants(
+            self.sess,
+            self.graph.as_graph_def(),
+            ['predictions']
+        )
+        graph_def = tf.graph_util.remove_training_nodes(
+            graph_def, protected_nodes=PROTECTED_NODES
+        )
+
+        graph = tf.Graph()
+        with graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        self.sess.close()
+        self.graph = graph
+        self.sess = tf.Session(graph=self.graph, config=self.session_config)
+
+    def report(self):
+        """Report of the split cache, to be fetched over a worker pool"""
+        return self.cache.report()
+
+    def warmup(self, lines=None):
+        """Run representative (IAST) lines through the model, uncached"""
+        lines = WARMUP_LINES if lines is None else lines
+        start = time.perf_counter()
+        for line in lines:
+            self._split_lines([line])
+        self._split_lines(lines)
+        self.logger.info(
+            f"Warm-up done in {time.perf_counter() - start:.2f}s."
+        )
+
     def _perform_split(self, path_in, path_out):
         """Perform Sandhi-Samaasa split on IAST input file
 
@@ -106,7 +373,83 @@ class Splitter:
             verbose=False
         )
 
-    @functools.lru_cache(MAX_CACHE)
+    def _encode(self, line):
+        """Model inputs of a line of IAST text
+
+        Returns
+        -------
+        tuple
+            (symbol ids, split counts), one entry per position in the line
+        """
+        x, split_cnts = self.sandhi_data.encode_line(line)
+        return list(x), list(split_cnts)
+
+    def _decode(self, line, predictions):
+        """Split line from the predictions of the model for the line"""
+        return self.sandhi_data.decode_line(line, predictions)
+
+    def _run_model(self, lines):
+        """Split a batch of lines in a single session run, in memory
+
+        Lines are padded to the longest line of the batch, which the batch
+        scheduler keeps close to the shortest one by bucketing on length.
+        """
+        encoded = [self._encode(line) for line in lines]
+        seqlens = [len(x) for x, _ in encoded]
+        max_len = max(seqlens)
+        predictions = self.sess.run(
+            self.predictions_ph,
+            feed_dict={
+                self.x_ph: [pad(x, max_len) for x, _ in encoded],
+                self.split_cnts_ph: [
+                    pad(split_cnts, max_len) for _, split_cnts in encoded
+                ],
+                self.seqlen_ph: seqlens,
+                self.dropout_ph: 1.0
+            }
+        )
+        return [
+            self._decode(line, line_predictions[:seqlen])
+            for line, line_predictions, seqlen in zip(
+                lines, predictions, seqlens
+            )
+        ]
+
+    def _split_lines(self, lines):
+        """Split a batch of non-empty IAST lines in a single model run
+
+        Parameters
+        ----------
+        lines : list
+            Lines of IAST text
+
+        Returns
+        -------
+        list
+            Split lines, corresponding to the input lines
+        """
+        if not self.use_files:
+            return self._run_model(lines)
+
+        # private files for every call, so concurrent calls do not clobber
+        with scratch_paths(
+            "input_sandhied", "output_unsandhied", tmp_dir=self.tmp_dir
+        ) as (path_in, path_out):
+            with open(path_in, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+
+            self._perform_split(path_in, path_out)
+
+            with open(path_out, encoding="utf-8") as f:
+                output_lines = f.read().strip("\n").split("\n")
+
+        if len(output_lines) != len(lines):
+            if len(lines) == 1:
+                return [" ".join(output_lines)]
+            self.logger.warning("Batch output misaligned, splitting lines.")
+            return [self._split_lines([line])[0] for line in lines]
+        return output_lines
+
     def split(self, input_text, input_scheme=sanscript.DEVANAGARI):
         """Split Sandhi and Samaasa from the Sanskrit text.
 
@@ -125,33 +468,48 @@ class Splitter:
         str
             Text with Sandhi-Samaasa split markers
         """
-        path_in = os.path.join(self.tmp_dir, "input_sandhied")
-        path_out = os.path.join(self.tmp_dir, "output_unsandhied")
-
-        with contextlib.suppress(FileNotFoundError):
-            os.remove(path_out)
-
-        with open(path_in, "w") as f:
-            if input_scheme != sanscript.IAST:
-                input_text = sanscript.transliterate(
-                    input_text, input_scheme, sanscript.IAST
-                )
-            f.write(input_text)
+        if input_scheme != sanscript.IAST:
+            input_text = sanscript.transliterate(
+                input_text, input_scheme, sanscript.IAST
+            )
 
-        self._perform_split(path_in, path_out)
+        input_lines = [normalize_line(line) for line in input_text.split("\n")]
+        split_lines = {
+            line: self.cache.get(line) for line in input_lines if line
+        }
+        missing = [
+            line for line, value in split_lines.items() if value is None
+        ]
+        if missing:
+            if self.batcher is not None:
+                outputs = self.batcher.submit(missing).result()
+            else:
+                outputs = self._split_lines(missing)
+            for line, output in zip(missing, outputs):
+                split_lines[line] = output
+                self.cache.set(line, output)
+
+        output_text = "\n".join(
+            split_lines[line] if line else "" for line in input_lines
+        )
 
-        with open(path_out) as f:
-            output_text = f.read()
-            if input_scheme != sanscript.IAST:
-                output_text = sanscript.transliterate(
-                    output_text, sanscript.IAST, input_scheme
-                )
+        if input_scheme != sanscript.IAST:
+            output_text = sanscript.transliterate(
+                output_text, sanscript.IAST, input_scheme
+            )
 
         return output_text
 
-    def split_file(self, path_in, path_out, input_scheme=sanscript.DEVANAGARI):
+    def split_file(self, path_in, path_out, input_scheme=sanscript.DEVANAGARI,
+                   chunk_size=FILE_CHUNK_SIZE, workers=FILE_WORKERS,
+                   resume=True):
         """Split Sandhi and Samaasa from a file
 
+        The file is streamed in chunks of lines, which are split in
+        parallel (and batched together) and written in order. Progress is
+        checkpointed after every chunk, in `path_out` + '.checkpoint',
+        so that an interrupted run can be resumed.
+
         Parameters
         ----------
         path_in : str
@@ -163,11 +521,173 @@ class Splitter:
             Recommended to use canonical variable defined by the sanscript
             module, e.g. sanscript.DEVANAGARI, sanscript.IAST, ...
             The default is sanscript.DEVANAGARI
+        chunk_size : int, optional
+            Number of lines in a chunk.
+            The default is FILE_CHUNK_SIZE.
+        workers : int, optional
+            Number of chunks split concurrently.
+            The default is FILE_WORKERS.
+        resume : bool, optional
+            If True, continue from the checkpoint of an earlier run.
+            The default is True.
         """
-        with open(path_in) as f:
-            input_text = f.read()
-        output_text = self.split(input_text, input_scheme=input_scheme)
-        with open(path_out, "w") as f:
-            f.write(output_text)
+        path_checkpoint = f"{path_out}.checkpoint"
+        checkpoint = {"input": os.path.abspath(path_in), "lines": 0,
+                      "offset": 0}
+        if resume and os.path.isfile(path_checkpoint):
+            with open(path_checkpoint, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("input") == checkpoint["input"]:
+                # the output up to the checkpoint must still be there
+                output_size = (
+                    os.path.getsize(path_out) if os.path.isfile(path_out)
+                    else -1
+                )
+                if output_size < saved["offset"]:
+                    self.logger.warning(
+                        f"Output '{path_out}' is missing or shorter than the "
+                        "checkpoint, starting from the beginning."
+                    )
+                else:
+                    checkpoint = saved
+                    self.logger.info(
+                        f"Resuming after {checkpoint['lines']} lines."
+                    )
+
+        def save_checkpoint():
+            path_tmp = f"{path_checkpoint}.tmp"
+            with open(path_tmp, "w", encoding="utf-8") as f:
+                json.dump(checkpoint, f)
+            os.replace(path_tmp, path_checkpoint)
+
+        mode = "r+b" if checkpoint["lines"] else "wb"
+        with open(path_in, encoding="utf-8") as f_in, \
+                open(path_out, mode) as f_out, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            # discard output written after the last checkpoint
+            f_out.seek(checkpoint["offset"])
+            f_out.truncate()
+
+            lines = (line.rstrip("\n") for line in f_in)
+            lines = itertools.islice(lines, checkpoint["lines"], None)
+
+            def chunks():
+                while True:
+                    chunk = list(itertools.islice(lines, chunk_size))
+                    if not chunk:
+                        return
+                    yield chunk
+
+            # bounded window of chunks in flight, written in order
+            in_flight = deque()
+            for chunk in itertools.chain(chunks(), [None]):
+                if chunk is not None:
+                    in_flight.append((len(chunk), executor.submit(
+                        self.split, "\n".join(chunk),
+                        input_scheme=input_scheme
+                    )))
+                    if len(in_flight) < 2 * workers:
+                        continue
+
+                while in_flight and (
+                    chunk is None or len(in_flight) >= 2 * workers
+                ):
+                    n_lines, future = in_flight.popleft()
+                    f_out.write((future.result() + "\n").encode("utf-8"))
+                    f_out.flush()
+                    os.fsync(f_out.fileno())
+
+                    checkpoint["lines"] += n_lines
+                    checkpoint["offset"] = f_out.tell()
+                    save_checkpoint()
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path_checkpoint)
+
+###############################################################################
+
+
+def benchmark(base_dir, settings, lines=None, repeat=5):
+    """Per-line latency of the splitter for various session settings
+
+    Parameters
+    ----------
+    base_dir : str
+        Path to the code directory of the splitter
+    settings : list
+        List of (intra_op_threads, inter_op_threads, optimize) tuples
+    lines : list, optional
+        Lines of IAST text. The default is WARMUP_LINES.
+    repeat : int, optional
+        Number of runs over the lines. The default is 5.
+
+    Returns
+    -------
+    list
+        List of (setting, median latency, p95 latency, load time) tuples,
+        latencies are in seconds per line
+    """
+    lines = WARMUP_LINES if lines is None else lines
+    results = []
+    for intra_op_threads, inter_op_threads, optimize in settings:
+        start = time.perf_counter()
+        splitter = Splitter(
+            base_dir,
+            batch_size=1,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=inter_op_threads,
+            optimize=optimize
+        )
+        load_time = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(repeat):
+            for line in lines:
+                start = time.perf_counter()
+                splitter._split_lines([line])
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results.append((
+            (intra_op_threads, inter_op_threads, optimize),
+            statistics.median(latencies),
+            latencies[int(0.95 * (len(latencies) - 1))],
+            load_time
+        ))
+        splitter.sess.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark session settings of the splitter"
+    )
+    parser.add_argument("base_dir", nargs="?", default=INSTALL_DIR)
+    parser.add_argument("--intra", default="0,1,2,4",
+                        help="comma separated intra-op thread counts")
+    parser.add_argument("--inter", default="0,1,2",
+                        help="comma separated inter-op thread counts")
+    parser.add_argument("--optimize", action="store_true",
+                        help="also benchmark the frozen graph")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    settings = [
+        (int(intra), int(inter), optimize)
+        for intra in args.intra.split(",")
+        for inter in args.inter.split(",")
+        for optimize in ([False, True] if args.optimize else [False])
+    ]
+    print(f"{'intra':>5} {'inter':>5} {'optimize':>8} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'load (s)':>9}")
+    for setting, p50, p95, load_time in benchmark(
+        args.base_dir, settings, repeat=args.repeat
+    ):
+        intra, inter, optimize = setting
+        print(f"{intra:>5} {inter:>5} {str(optimize):>8} "
+              f"{p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {load_time:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
 
 ###############################################################################
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transliteration Service
+
+Wrapper around `indic_transliteration.sanscript` with a precompiled
+SchemeMap per (source, target) pair and a bounded memo of short tokens,
+such as queries, roots and command aliases, which are converted repeatedly.
+"""
+
+###############################################################################
+
+import re
+import threading
+
+from utils.cache import Cache
+
+###############################################################################
+
+MEMO_SIZE = 8192
+MEMO_MAX_LENGTH = 64
+
+# Whitespace and ASCII punctuation that are the same in every scheme,
+# i.e. not digits or ' . _ | ~, which are letters, signs or dandas in some
+PASSTHROUGH_PATTERN = re.compile(r'^[\s!"#$%&()*+,\-/:;<=>?@\[\\\]^`{}]*$')
+
+###############################################################################
+
+
+class Transliterator:
+    def __init__(self, memo_size=MEMO_SIZE, memo_max_length=MEMO_MAX_LENGTH):
+        """
+        Memoized transliteration
+
+        Parameters
+        ----------
+        memo_size : int, optional
+            Maximum number of memoized results.
+            The default is MEMO_SIZE.
+        memo_max_length : int, optional
+            Only texts up to this length are memoized.
+            The default is MEMO_MAX_LENGTH.
+        """
+        self.memo = Cache('transliteration', maxsize=memo_size)
+        self.memo_max_length = memo_max_length
+        self.scheme_maps = {}
+        self._lock = threading.Lock()
+
+    def get_scheme_map(self, from_scheme, to_scheme):
+        """Precompiled SchemeMap from `from_scheme` to `to_scheme`"""
+        key = (from_scheme, to_scheme)
+        scheme_map = self.scheme_maps.get(key)
+        if scheme_map is None:
+            from indic_transliteration import sanscript
+            with self._lock:
+                scheme_map = self.scheme_maps.get(key)
+                if scheme_map is None:
+                    scheme_map = sanscript.SchemeMap(
+                        sanscript.SCHEMES[from_scheme],
+                        sanscript.SCHEMES[to_scheme]
+                    )
+                    self.scheme_maps[key] = scheme_map
+        return scheme_map
+
+    def precompile(self, pairs):
+        """Precompile SchemeMaps for the (from_scheme, to_scheme) pairs"""
+        for from_scheme, to_scheme in pairs:
+            if from_scheme != to_scheme:
+                self.get_scheme_map(from_scheme, to_scheme)
+        return self
+
+    def transliterate(self, text, from_scheme, to_scheme):
+        if (
+            from_scheme == to_scheme
+            or not text
+            or PASSTHROUGH_PATTERN.match(text)
+        ):
+            return text
+
+        memoize = len(text) <= self.memo_max_length
+        if memoize:
+            key = (text, from_scheme, to_scheme)
+            result = self.memo.get(key)
+            if result is not None:
+                return result
+
+        from indic_transliteration import sanscript
+        result = sanscript.transliterate(
+            text, scheme_map=self.get_scheme_map(from_scheme, to_scheme)
+        )
+        if memoize:
+            self.memo.set(key, result)
+        return result
+
+###############################################################################
+
+
+TRANSLITERATOR = Transliterator()
+
+
+def transliterate(text, from_scheme, to_scheme):
+    """Transliterate `text` using the shared Transliterator"""
+    return TRANSLITERATOR.transliterate(text, from_scheme, to_scheme)
+
+###############################################################################
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Worker Processes
+
+Host an object (e.g. the Splitter) in dedicated worker processes, each with
+its own instance, and call its methods over IPC queues, so that CPU-bound
+work stays off the event loop and scales across cores.
+"""
+
+###############################################################################
+
+import os
+import time
+import queue
+import asyncio
+import logging
+import importlib
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, InvalidStateError
+
+###############################################################################
+
+# A worker that dies is restarted after RESTART_BACKOFF seconds, doubled on
+# every consecutive failure (up to MAX_RESTART_BACKOFF), and given up on
+# after MAX_RESTARTS failures without becoming ready
+MAX_RESTARTS = 5
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 60.0
+
+###############################################################################
+
+
+class WorkerError(Exception):
+    pass
+
+###############################################################################
+
+
+def resolve(target):
+    """Resolve 'package.module.attribute' to the attribute"""
+    if not isinstance(target, str):
+        return target
+    module_name, _, attribute = target.rpartition('.')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def worker_main(factory, args, kwargs, requests, responses, threads):
+    """Worker process: create the object and serve method calls"""
+    logger = logging.getLogger('Worker')
+    try:
+        instance = resolve(factory)(*args, **kwargs)
+    except Exception:
+        logger.exception("Worker initialization failed.")
+        raise
+    responses.put((None, True, os.getpid()))
+
+    def call(request_id, method, call_args, call_kwargs):
+        try:
+            result = getattr(instance, method)(*call_args, **call_kwargs)
+        except Exception as e:
+            responses.put((request_id, False, f'{type(e).__name__}: {e}'))
+        else:
+            responses.put((request_id, True, result))
+
+    # concurrent calls within a worker, e.g. to let the splitter batch them
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            executor.submit(call, *request)
+
+###############################################################################
+
+
+class Worker:
+    def __init__(self, context, target, worker_args, worker_id, restarts=0):
+        self.worker_id = worker_id
+        self.restarts = restarts
+        self.requests = context.Queue()
+        self.pending = set()
+        self.ready = False
+        self.failed = False
+        self.respawn_at = None
+        self.process = context.Process(
+            target=target,
+            args=worker_args[:3] + (self.requests,) + worker_args[3:],
+            name=f'Worker-{worker_id}',
+            daemon=True
+        )
+        self.process.start()
+
+    @property
+    def available(self):
+        return (
+            self.respawn_at is None
+            and not self.failed
+            and self.process.is_alive()
+        )
+
+###############################################################################
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        factory,
+        args=(),
+        kwargs=None,
+        replicas=1,
+        timeout=60,
+        threads=4,
+        start_method='spawn',
+        max_restarts=MAX_RESTARTS,
+        restart_backoff=RESTART_BACKOFF
+    ):
+        """
+        Pool of worker processes, each hosting an instance of `factory`
+
+        Parameters
+        ----------
+        factory : callable or str
+            Class (or factory function) for the hosted object.
+            A dotted path, e.g. 'utils.splitter.Splitter', avoids importing
+            the module in the parent process.
+        args : tuple, optional
+            Positional arguments for the factory.
+            The default is ().
+        kwargs : dict, optional
+            Keyword arguments for the factory.
+            The default is None.
+        replicas : int, optional
+            Number of worker processes.
+            The default is 1.
+        timeout : float, optional
+            Time (in seconds) after which a call is abandoned.
+            The default is 60.
+        threads : int, optional
+            Number of concurrent calls served by a worker.
+            The default is 4.
+        start_method : str, optional
+            Multiprocessing start method.
+            Workers of a 'fork' pool are not restarted, as they would be
+            forked from the thread that monitors them.
+            The default is 'spawn'.
+        max_restarts : int, optional
+            Number of consecutive restarts of a worker that dies before it
+            is ready, after which it is given up on.
+            The default is MAX_RESTARTS.
+        restart_backoff : float, optional
+            Delay (in seconds) before the first restart of a worker,
+            doubled on every consecutive restart.
+            The default is RESTART_BACKOFF.
+        """
+        self.factory = factory
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.replicas = replicas
+        self.timeout = timeout
+        self.threads = threads
+        # forking from a thread, with the others running, is unsafe
+        self.max_restarts = 0 if start_method == 'fork' else max_restarts
+        self.restart_backoff = restart_backoff
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.context = multiprocessing.get_context(start_method)
+        self.responses = self.context.Queue()
+        self.workers = []
+        self.futures = {}
+        # all the workers have been given up on
+        self.failed = False
+
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self._started = None
+
+    # ----------------------------------------------------------------------- #
+
+    def _spawn(self, worker_id, restarts=0):
+        return Worker(
+            self.context,
+            worker_main,
+            (self.factory, self.args, self.kwargs, self.responses,
+             self.threads),
+            worker_id,
+            restarts
+        )
+
+    @property
+    def ready(self):
+        """Number of workers ready to serve calls"""
+        return sum(worker.ready for worker in self.workers)
+
+    @property
+    def available(self):
+        """Number of workers that calls are sent to"""
+        return sum(worker.available for worker in self.workers)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.workers = [self._spawn(idx) for idx in range(self.replicas)]
+        self._thread = threading.Thread(target=self._collect, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed = True
+        for worker in self.workers:
+            worker.requests.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self._thread is not None:
+            self._thread.join()
+
+    # ----------------------------------------------------------------------- #
+
+    def _collect(self):
+        """Resolve futures from responses, restart crashed workers"""
+        last_check = time.monotonic()
+        while not self._closed:
+            if time.monotonic() - last_check > 1:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                request_id, ok, result = self.responses.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if request_id is None:
+                # result is the pid of the worker that is ready
+                for worker in self.workers:
+                    if worker.process.pid == result:
+                        worker.ready = True
+                        worker.restarts = 0
+                self.logger.info(
+                    f"Worker ready ({self.ready}/{len(self.workers)}) "
+                    f"after {time.perf_counter() - self._started:.3f}s."
+                )
+                continue
+
+            with self._lock:
+                future = self.futures.pop(request_id, None)
+                for worker in self.workers:
+                    worker.pending.discard(request_id)
+            if future is None or future.done():
+                continue
+            try:
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(WorkerError(result))
+            except InvalidStateError:
+                # cancelled by the caller in the meantime
+                pass
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for idx, worker in enumerate(self.workers):
+            if self._closed or worker.failed:
+                continue
+            if worker.respawn_at is not None:
+                if now >= worker.respawn_at:
+                    with self._lock:
+                        self.workers[idx] = self._spawn(
+                            worker.worker_id, worker.restarts
+                        )
+                continue
+            if worker.process.is_alive():
+                continue
+
+            worker.ready = False
+            if worker.restarts >= self.max_restarts:
+                worker.failed = True
+                self.logger.error(
+                    f"Worker {worker.worker_id} died "
+                    f"(exitcode={worker.process.exitcode}), giving up "
+                    f"after {worker.restarts} restarts."
+                )
+            else:
+                delay = min(
+                    self.restart_backoff * 2 ** worker.restarts,
+                    MAX_RESTART_BACKOFF
+                )
+                worker.restarts += 1
+                worker.respawn_at = now + delay
+                self.logger.error(
+                    f"Worker {worker.worker_id} died "
+                    f"(exitcode={worker.process.exitcode}), "
+                    f"restarting in {delay:.1f}s."
+                )
+            with self._lock:
+                pending = [
+                    self.futures.pop(request_id, None)
+                    for request_id in worker.pending
+                ]
+                worker.pending.clear()
+            for future in pending:
+                if future is not None and not future.done():
+                    future.set_exception(WorkerError("Worker crashed."))
+
+        if self.workers and all(worker.failed for worker in self.workers):
+            if not self.failed:
+                self.logger.error("All workers have failed.")
+            self.failed = True
+
+    # ----------------------------------------------------------------------- #
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Call a method of the hosted object in one of the workers
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the result of the call
+        """
+        with self._lock:
+            workers = [worker for worker in self.workers if worker.available]
+            if not workers:
+                future = Future()
+                future.set_exception(WorkerError(
+                    "All workers have failed." if self.failed
+                    else "No worker is running."
+                ))
+                return future
+            worker = min(workers, key=lambda w: len(w.pending))
+            return self._send(worker, method, args, kwargs)
+
+    def broadcast(self, method, *args, **kwargs):
+        """
+        Call a method of the hosted object in every running worker
+
+        Returns
+        -------
+        list
+            List of concurrent.futures.Future, one for every worker
+        """
+        with self._lock:
+            return [
+                self._send(worker, method, args, kwargs)
+                for worker in self.workers
+                if worker.available
+            ]
+
+    def _send(self, worker, method, args, kwargs):
+        future = Future()
+        request_id = next(self._ids)
+        worker.pending.add(request_id)
+        self.futures[request_id] = future
+        worker.requests.put((request_id, method, args, kwargs))
+        return future
+
+    async def run(self, method, *args, **kwargs):
+        """Awaitable `submit`, abandoned after `timeout` seconds"""
+        future = self.submit(method, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        finally:
+            if not future.done():
+                future.cancel()
+
+###############################################################################